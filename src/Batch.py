@@ -0,0 +1,44 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+@dataclass
+class Batch:
+    # the tokens found in many inputs, stored in flat arrays shared by all the inputs.
+    # token i was found in sources[inputs[i]]: it is the token number tokens[i] of the spec, matching
+    # sources[inputs[i]][starts[i]:ends[i]]. the tokens of an input are contiguous and in order
+    sources: list[str]
+    names: list[str]
+    inputs: array
+    tokens: array
+    starts: array
+    ends: array
+
+    # maps the index of every input which could not be split into tokens to the lexer error message; the tokens
+    # of such an input are the ones found before the error
+    errors: dict[int, str]
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int, int]]:
+        # iterate over the tokens as (input index, token index in the spec, start, end) tuples
+        return zip(self.inputs, self.tokens, self.starts, self.ends)
+
+    def __getitem__(self, i: int) -> tuple[str, str]:
+        # materialize token i as (TOKEN_NAME, MATCHED_STRING)
+        return self.names[self.tokens[i]], self.lexeme(i)
+
+    def lexeme(self, i: int) -> str:
+        return self.sources[self.inputs[i]][self.starts[i] : self.ends[i]]
+
+    def result(self, input: int) -> list[tuple[str, str]]:
+        # the tokens of one input, in the format returned by Lexer.lex
+        if input in self.errors:
+            return [("", self.errors[input])]
+
+        first = bisect_left(self.inputs, input)
+        last = bisect_left(self.inputs, input + 1)
+
+        return [self[i] for i in range(first, last)]
@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+
+@dataclass
+class BitNFA[STATE]:
+    # an nfa whose sets of states are represented as integer bitsets: bit i stands for states[i]
+    states: list[STATE]
+
+    # the epsilon closure of the initial state
+    q0: int
+
+    # moves[i][c] is the union of the epsilon closures of the states reached from states[i] on character c
+    moves: list[dict[str, int]]
+
+    # the bitset of the final states
+    F: int
+
+    def members(self, mask: int) -> frozenset[STATE]:
+        # convert a bitset back to the set of states it stands for
+        states = []
+
+        while mask:
+            low = mask & -mask
+            states.append(self.states[low.bit_length() - 1])
+            mask ^= low
+
+        return frozenset(states)
+
+    def step(self, mask: int) -> dict[str, int]:
+        # compute the set of states reached from the bitset 'mask' on every character, in a single pass over
+        # its states; characters missing from the result lead to the empty set
+        nexts = {}
+
+        while mask:
+            low = mask & -mask
+            mask ^= low
+
+            for c, states in self.moves[low.bit_length() - 1].items():
+                nexts[c] = nexts.get(c, 0) | states
+
+        return nexts
+
+    def live(self) -> int:
+        # the bitset of the states from which a final state can be reached; a set of states without any of them
+        # can never lead to a final state
+        predecessors = [[] for _ in self.states]
+
+        for state, moves in enumerate(self.moves):
+            for mask in moves.values():
+                while mask:
+                    low = mask & -mask
+                    mask ^= low
+                    predecessors[low.bit_length() - 1].append(state)
+
+        live = self.F
+        stack = [i for i in range(len(self.states)) if self.F >> i & 1]
+
+        while len(stack) > 0:
+            for state in predecessors[stack.pop()]:
+                if not live >> state & 1:
+                    live |= 1 << state
+                    stack.append(state)
+
+        return live
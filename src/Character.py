@@ -1,12 +1,41 @@
 from .NFA import NFA
 from .Regex import Regex
+from .Empty import Empty
+from .Epsilon import Epsilon
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Character(Regex):
     c: str
 
-    def thompson(self) -> NFA[int]:
-        # convert Character regex to a dfa
-        #  (0) -----c----> (1)
-        return NFA({self.c}, {0, 1},  0, {(0, self.c): {1}}, {1})
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add the nfa of the Character regex
+        #  (start) -----c----> (final)
+        start = nfa.add_state()
+        final = nfa.add_state()
+
+        nfa.add_transition(start, self.c, final)
+
+        return start, final
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        # a leaf is a single position
+        chars.append(self.character_sets()[0])
+        follow.append(set())
+
+        return False, {len(chars) - 1}, {len(chars) - 1}
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return [frozenset(self.c)]
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return self
+
+    def utf8(self) -> Regex:
+        return self if self.c < '\x80' else Regex.make_utf8([(ord(self.c), ord(self.c))])
+
+    def nullable(self) -> bool:
+        return False
+
+    def derivative(self, c: str) -> Regex:
+        return Epsilon() if c == self.c else Empty()
@@ -0,0 +1,65 @@
+from .NFA import NFA
+from .Regex import Regex
+from .Complement import Complement
+from .Empty import Empty
+from .Epsilon import Epsilon
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class CharacterSet(Regex):
+    # a character class like [a-zA-Z_]: matches one of the characters, or if negated ([^a-z]) any character which
+    # is not one of them
+    characters: frozenset[str]
+    negated: bool = False
+
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # the nfa has a transition from the start state to the final state for each character of the set. a negated
+        # set matches infinitely many characters: it has a transition for each character of the alphabet of the
+        # nfa it matches, so the alphabet must be known before the nfa is built
+        start = nfa.add_state()
+        final = nfa.add_state()
+
+        if self.negated:
+            characters = [c for c in nfa.S if c not in self.characters]
+        else:
+            characters = self.characters
+
+        for c in characters:
+            nfa.add_transition(start, c, final)
+
+        return start, final
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        # a leaf is a single position
+        chars.append(self.character_sets()[0])
+        follow.append(set())
+
+        return False, {len(chars) - 1}, {len(chars) - 1}
+
+    def character_sets(self) -> list[frozenset[str] | Complement]:
+        return [Complement(self.characters) if self.negated else self.characters]
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return Regex.make_leaf(self.character_sets()[0])
+
+    def utf8(self) -> Regex:
+        # the codes of the characters of the set, as ranges
+        ranges = []
+        for code in sorted(ord(c) for c in self.characters):
+            if len(ranges) > 0 and code == ranges[-1][1] + 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+
+        if self.negated:
+            # the ranges between the ranges of the set
+            bounds = [-1] + [code for codes in ranges for code in codes] + [0x110000]
+            ranges = [[bounds[i] + 1, bounds[i + 1] - 1] for i in range(0, len(bounds), 2)]
+
+        return Regex.make_utf8([(start, end) for start, end in ranges if start <= end])
+
+    def nullable(self) -> bool:
+        return False
+
+    def derivative(self, c: str) -> Regex:
+        return Epsilon() if (c in self.characters) != self.negated else Empty()
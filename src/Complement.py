@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Complement:
+    # the set of all the characters except the given ones, e.g. the characters matched by [^a-z]. it is infinite
+    # (as far as the lexer knows), so it can only be tested for membership, not iterated over
+    characters: frozenset[str]
+
+    def __contains__(self, c: str) -> bool:
+        return c not in self.characters
+
+    def representative(self) -> str:
+        # the smallest character of the set, which stands for the whole set in the automata
+        code = 0
+        while chr(code) in self.characters:
+            code += 1
+
+        return chr(code)
+
+def representative(characters: frozenset[str] | Complement) -> str:
+    # the character standing for a class of characters in the automata: its smallest character
+    return characters.representative() if isinstance(characters, Complement) else min(characters)
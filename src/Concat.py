@@ -3,35 +3,106 @@ from .NFA import EPSILON
 from .Regex import Regex
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Concat(Regex):
     left: Regex
     right: Regex
 
-    def thompson(self) -> NFA[int]:
-        # convert the left regex to an NFA
-        leftNFA = self.left.thompson()
+    def __hash__(self) -> int:
+        # the hash is computed once. the suffixes of the chain of concatenations whose hashes are not known yet are
+        # hashed from the last one, each from the hash of the next one: hashing a long chain neither recurses
+        # through it nor hashes it again for every suffix, as simplify and the brzozowski construction do
+        if '_hash' not in self.__dict__:
+            chain = [self]
+            while type(chain[-1].right) is Concat and '_hash' not in chain[-1].right.__dict__:
+                chain.append(chain[-1].right)
 
-        # convert the right regex to an NFA, use the remap_states function to shift the states'
-        # values by the number of states in the left NFA so there are no duplicate states
-        rightNFA = self.right.thompson().remap_states(lambda x: x + len(leftNFA.K))
+            for regex in reversed(chain):
+                object.__setattr__(regex, '_hash', hash((regex.left, regex.right)))
 
-        # S is the union between the two nfas' alphabets
-        S = leftNFA.S | rightNFA.S
-    
-        # the initial state is the left nfa's initial state
-        q0 = leftNFA.q0
+        return self.__dict__['_hash']
 
-        # K contains all the states of the two nfas
-        K = leftNFA.K | rightNFA.K
-    
-        # merge the two dictionaries (transition relations)
-        d = leftNFA.d | rightNFA.d
+    def __eq__(self, other: object) -> bool:
+        # two chains of concatenations are compared part by part, without recursion; chains with different hashes
+        # differ, and the rests of hash-consed chains are often the same instance
+        left, right = self, other
 
-        finalState = list(leftNFA.F)[0]
-        finalStateSet = set() if (finalState, EPSILON) not in leftNFA.d else leftNFA.d[(finalState, EPSILON)]
+        while type(left) is Concat and type(right) is Concat:
+            if left is right:
+                return True
 
-        # add an epsilon transition from the final state of leftNFA to the initial state of rightNFA
-        d[(finalState, EPSILON)] = finalStateSet | {rightNFA.q0}
+            if hash(left) != hash(right) or left.left != right.left:
+                return False
 
-        return NFA(S, K, q0, d, rightNFA.F)
+            left, right = left.right, right.right
+
+        if type(self) is not type(other):
+            return NotImplemented
+
+        return left == right
+
+    def __getstate__(self) -> dict:
+        # the hashes of strings change between processes, so a cached hash is not pickled
+        return {name: value for name, value in self.__dict__.items() if name != '_hash'}
+
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add the nfas of the left and right regexes
+        leftStart, leftFinal = self.left.build(nfa)
+        rightStart, rightFinal = self.right.build(nfa)
+
+        # add an epsilon transition from the final state of the left nfa to the initial state of the right nfa
+        nfa.add_transition(leftFinal, EPSILON, rightStart)
+
+        return leftStart, rightFinal
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        leftNullable, leftFirst, leftLast = self.left.positions(chars, follow)
+        rightNullable, rightFirst, rightLast = self.right.positions(chars, follow)
+
+        # the first positions of the right regex can follow the last positions of the left one
+        for p in leftLast:
+            follow[p] |= rightFirst
+
+        first = leftFirst | rightFirst if leftNullable else leftFirst
+        last = leftLast | rightLast if rightNullable else rightLast
+
+        return leftNullable and rightNullable, first, last
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return self.left.character_sets() + self.right.character_sets()
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        # the parts of a chain of concatenations are simplified, then concatenated from the right; the chain is
+        # walked without recursion, so a long literal or a large repetition count is not limited by the stack
+        parts = []
+        stack = [self]
+
+        while len(stack) > 0:
+            regex = stack.pop()
+
+            if isinstance(regex, Concat):
+                stack.extend([regex.right, regex.left])
+            else:
+                parts.append(regex.simplify(nodes))
+
+        result = parts.pop()
+        while len(parts) > 1:
+            result = Regex.make_concat(parts.pop(), result)
+            result = nodes.setdefault(result, result)
+
+        return Regex.make_concat(parts[0], result)
+
+    def utf8(self) -> Regex:
+        return Concat(self.left.utf8(), self.right.utf8())
+
+    def nullable(self) -> bool:
+        return self.left.nullable() and self.right.nullable()
+
+    def derivative(self, c: str) -> Regex:
+        # d(lr) = d(l)r, or d(l)r | d(r) if l matches the empty word
+        derivative = Regex.make_concat(self.left.derivative(c), self.right)
+
+        if self.left.nullable():
+            derivative = Regex.make_union(derivative, self.right.derivative(c))
+
+        return derivative
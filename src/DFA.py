@@ -1,3 +1,7 @@
+from .TransitionTable import TransitionTable
+from .Complement import Complement, representative
+
+from array import array
 from collections.abc import Callable
 from dataclasses import dataclass
 
@@ -46,3 +50,154 @@ class DFA[STATE]:
         new_F = {f(state) for state in self.F}
 
         return DFA(self.S, new_K, f(self.q0), new_d, new_F)
+
+    def minimize(self, label: Callable[[STATE], object] | None = None) -> 'DFA[frozenset[STATE]]':
+        # merge equivalent states using Hopcroft's partition refinement algorithm. each state of the result is
+        # the frozenset of original states it replaces; unreachable states are dropped.
+        # states start in the same block only if they have the same label (by default: whether they are final),
+        # so a label such as the token recognised by a state is preserved by the minimization
+        if label is None:
+            label = lambda state: state in self.F
+
+        states = list(self.state_numbers())
+        alphabet = sorted(self.S)
+
+        # predecessors[c][q] is the list of reachable states that go to q on character c; the unreachable states
+        # are in no block, so their transitions are left out
+        predecessors = {c: {} for c in alphabet}
+        for state in states:
+            for c in alphabet:
+                target = self.d.get((state, c))
+                if target is not None:
+                    predecessors[c].setdefault(target, []).append(state)
+
+        # initial partition: one block per label
+        blocks = {}
+        for state in states:
+            blocks.setdefault(label(state), set()).add(state)
+
+        partition = list(blocks.values())
+        block = {state: index for index, states in enumerate(partition) for state in states}
+
+        # every block is a splitter, except the largest one, which is redundant
+        largest = max(range(len(partition)), key=lambda index: len(partition[index]))
+        work = {index for index in range(len(partition)) if index != largest}
+
+        while len(work) > 0:
+            splitter = partition[work.pop()]
+
+            for c in alphabet:
+                # states that reach the splitter on c, grouped by the block they belong to
+                touched = {}
+                for target in splitter:
+                    for state in predecessors[c].get(target, []):
+                        touched.setdefault(block[state], set()).add(state)
+
+                for index, inside in touched.items():
+                    if len(inside) == len(partition[index]):
+                        continue
+
+                    # split the block into the states that reach the splitter on c and those that do not;
+                    # the block keeps the larger half and the smaller one becomes a new block
+                    outside = partition[index] - inside
+                    smaller, larger = (inside, outside) if len(inside) <= len(outside) else (outside, inside)
+
+                    partition[index] = larger
+                    partition.append(smaller)
+
+                    for state in smaller:
+                        block[state] = len(partition) - 1
+
+                    # if the block was still waiting to be used as a splitter both halves must be used, otherwise
+                    # using the smaller half is enough
+                    work.add(len(partition) - 1)
+
+        new_K = [frozenset(states) for states in partition]
+
+        new_d = {}
+        for index, states in enumerate(partition):
+            state = next(iter(states))
+
+            for c in alphabet:
+                if (state, c) in self.d:
+                    new_d[(new_K[index], c)] = new_K[block[self.d[(state, c)]]]
+
+        new_F = {Q for Q in new_K if any(state in self.F for state in Q)}
+
+        return DFA(self.S, set(new_K), new_K[block[self.q0]], new_d, new_F)
+
+    def state_numbers(self) -> dict[STATE, int]:
+        # number the states reachable from q0 with dense integers, in breadth-first order; q0 is always 0.
+        # the characters are visited in sorted order, so the numbering does not depend on set iteration order
+        numbers = {self.q0: 0}
+        queue = [self.q0]
+        alphabet = sorted(self.S)
+
+        for state in queue:
+            for c in alphabet:
+                next = self.d.get((state, c))
+
+                if next is not None and next not in numbers:
+                    numbers[next] = len(numbers)
+                    queue.append(next)
+
+        return numbers
+
+    def compile(self, token: Callable[[STATE], int] | None = None,
+                classes: list[frozenset[str] | Complement] | None = None) -> TransitionTable:
+        # build a flat integer transition table from this dfa, so that a transition is an array lookup instead of
+        # hashing a (state, character) pair.
+        # token maps a state to the index of the token it recognises (-1 if none); by default every final state
+        # recognises token 0.
+        # classes groups characters which behave the same: each class gets a single column, and is represented in
+        # the alphabet of the dfa by its smallest character. by default every character is a class of its own.
+        # a Complement class gets the column of the characters which are not in the other classes
+        if token is None:
+            token = lambda state: 0 if state in self.F else -1
+
+        if classes is None:
+            classes = [frozenset(c) for c in self.S]
+
+        classes = sorted(classes, key=representative)
+
+        numbers = self.state_numbers()
+        columns = {}
+        other = -1
+        for column, characters in enumerate(classes):
+            if isinstance(characters, Complement):
+                other = column
+            else:
+                columns.update((c, column) for c in characters)
+        width = len(classes)
+
+        d = array('i', [0]) * (len(numbers) * width)
+        alphabet = [representative(characters) for characters in classes]
+
+        for state, number in numbers.items():
+            for column, c in enumerate(alphabet):
+                d[number * width + column] = numbers[self.d[(state, c)]]
+
+        accepting = array('i', [-1]) * len(numbers)
+        for state, number in numbers.items():
+            accepting[number] = token(state)
+
+        # a state is alive if a final state can be reached from it: walk the transitions backwards from the
+        # final states, everything left unvisited is dead
+        predecessors = [[] for _ in numbers]
+        for number in range(len(numbers)):
+            for next in d[number * width : (number + 1) * width]:
+                predecessors[next].append(number)
+
+        dead = array('b', [1]) * len(numbers)
+        queue = [number for number in range(len(numbers)) if accepting[number] != -1]
+
+        for number in queue:
+            dead[number] = 0
+
+        for number in queue:
+            for previous in predecessors[number]:
+                if dead[previous]:
+                    dead[previous] = 0
+                    queue.append(previous)
+
+        return TransitionTable(columns, width, 0, d, accepting, dead, other)
@@ -0,0 +1,211 @@
+from .Spans import Spans
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+# the first scan after an edit reads tokens starting in this many characters; every following scan reads twice as
+# many, until the new tokens meet the old ones again
+WINDOW = 64
+
+@dataclass
+class Document:
+    # a text split into tokens, which can be edited without lexing the whole text again, see Lexer.lex_document.
+    # every token is scanned from the initial state of the dfa, and only depends on the characters read to find it:
+    # up to its reach, the last character the scan looked at (the end of the longest match, and the lookahead
+    # which failed to find a longer one). an edit only changes the tokens which read a character it replaced, so
+    # lexing starts again from the first of them, and stops as soon as a new token ends where an old token after
+    # the edit started: from there on, the scan reads the same text as before and finds the same tokens
+    lexer: 'Lexer'
+
+    # the text; bytes for a binary lexer
+    text: str | bytes
+
+    # token i is the token number tokens[i] of the spec, matching text[starts[i]:ends[i]], see Spans
+    tokens: array = field(default_factory=lambda: array('i'))
+    starts: array = field(default_factory=lambda: array('q'))
+    ends: array = field(default_factory=lambda: array('q'))
+
+    # reaches[i] is the last character read to find token i or a token before it (len(text) for the end of the
+    # text); as a maximum over the tokens before, it only grows, so the tokens reading a position are found by
+    # binary search
+    reaches: array = field(default_factory=lambda: array('q'))
+
+    # the index of the character where no token matched after the last token, or -1 if the whole text was split
+    error: int = -1
+
+    # the offsets (starts, ends and reaches) of the tokens from index 'shifted' on are 'delta' too small. an edit
+    # moves every token after it, so moving them at once would take time proportional to the size of the text:
+    # they are only moved when an edit or an access needs them, see move. an edit then takes time proportional to
+    # the tokens it changes and to the tokens between it and the previous edit, which is small while typing
+    shifted: int = 0
+    delta: int = 0
+
+    def __post_init__(self) -> None:
+        _, self.error = self.lexer.scan(self.text, 0, self.tokens, self.starts, self.ends, reaches=self.reaches)
+
+        for i in range(1, len(self.reaches)):
+            self.reaches[i] = max(self.reaches[i], self.reaches[i - 1])
+
+        self.shifted = len(self.tokens)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        # iterate over the tokens as (token index in the spec, start, end) tuples
+        self.move(len(self.tokens))
+        return zip(self.tokens, self.starts, self.ends)
+
+    def __getitem__(self, i: int) -> tuple[str, str | bytes]:
+        # materialize token i as (TOKEN_NAME, MATCHED_STRING)
+        if i < 0:
+            i += len(self.tokens)
+
+        start = self.offset(self.starts, i)
+        end = self.offset(self.ends, i)
+
+        return self.lexer.spec[self.tokens[i]][0], self.text[start:end]
+
+    def spans(self) -> Spans:
+        # the tokens of the current text, and the lexer error message, if any. the spans share the arrays of the
+        # document, so they are only valid until the next edit
+        self.move(len(self.tokens))
+        spans = Spans(self.text, [name for name, _ in self.lexer.spec], self.tokens, self.starts, self.ends)
+
+        if self.error != -1:
+            spans.error = self.lexer.error(self.text, self.error)[0][1]
+
+        return spans
+
+    def offset(self, values: array, i: int) -> int:
+        # the offset values[i] of token i, in the current text
+        return values[i] + self.delta if i >= self.shifted else values[i]
+
+    def search(self, values: array, target: int) -> int:
+        # the index of the first token whose offset in values is at least target, for starts, ends or reaches
+        low, high = 0, len(values)
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self.offset(values, middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def move(self, shifted: int) -> None:
+        # make the offsets of the tokens before 'shifted' exact, and those from 'shifted' on 'delta' too small;
+        # this takes time proportional to the number of tokens between the old and the new value of shifted
+        if self.delta == 0:
+            self.shifted = shifted
+            return
+
+        step = self.delta if shifted > self.shifted else -self.delta
+
+        for i in range(min(shifted, self.shifted), max(shifted, self.shifted)):
+            self.starts[i] += step
+            self.ends[i] += step
+            self.reaches[i] += step
+
+        self.shifted = shifted
+
+    def edit(self, offset: int, deleted: int, inserted: str | bytes) -> tuple[int, int, int]:
+        # replace the 'deleted' characters of the text at offset by the inserted text, and lex the text again
+        # around the edit. returns the index of the first token which changed, the number of old tokens which were
+        # removed from there and the number of new tokens which replaced them
+        if offset < 0 or deleted < 0 or offset + deleted > len(self.text):
+            raise ValueError(f'invalid edit of {deleted} characters at offset {offset} of a text of {len(self.text)}')
+
+        text = self.text[:offset] + inserted + self.text[offset + deleted:]
+        delta = len(inserted) - deleted
+        count = len(self.tokens)
+
+        # the end of the edit in the new text
+        newEnd = offset + len(inserted)
+
+        # nothing after the character where lexing failed was read, nor after the reach of the last token, which
+        # may be further when that token looked for a longer match
+        if self.error != -1 and offset > max(self.error, self.offset(self.reaches, count - 1) if count > 0 else -1):
+            self.text = text
+            return count, 0, 0
+
+        # the first token which read a character of the edit, or the character after an insertion: the tokens
+        # before it read the same text as before
+        first = self.search(self.reaches, offset)
+        if first < count:
+            start = self.offset(self.starts, first)
+        else:
+            start = self.offset(self.ends, count - 1) if count > 0 else 0
+
+        # the end of the last old token, where the old text could not be split further if there was an error
+        last = self.offset(self.ends, count - 1) if count > 0 else 0
+
+        tokens, starts, ends, reaches = array('i'), array('q'), array('q'), array('q')
+        error = -1
+
+        # lex the new text from the start of the first changed token, checking at every token boundary after the
+        # edit whether an old token started at the same place in the old text
+        index = start
+        checked = 0
+        resync = -1
+        window = WINDOW
+
+        while True:
+            while True:
+                if index >= newEnd:
+                    j = self.search(self.starts, index - delta)
+
+                    # the old tokens from j on (and the error after them, if any) are found again. the old text
+                    # may also end there, or fail to split further in the same way
+                    if j < count and self.offset(self.starts, j) == index - delta or \
+                       j == count and index - delta == last:
+                        resync = j
+                        error = self.error + delta if self.error != -1 else -1
+                        break
+
+                if checked == len(tokens):
+                    break
+
+                index = ends[checked]
+                checked += 1
+
+            if resync != -1:
+                break
+
+            # no token matches after the last new one, or the new text ended: no old token is left to meet
+            if error != -1 or index >= len(text):
+                resync = count
+                break
+
+            _, error = self.lexer.scan(text, index, tokens, starts, ends, True, index + window, reaches)
+            window *= 2
+
+        # the tokens found after the boundary where the old tokens were met again are the old ones
+        del tokens[checked:], starts[checked:], ends[checked:], reaches[checked:]
+
+        # replace the changed tokens, and move the offsets of the tokens after them
+        self.move(resync)
+
+        self.tokens[first:resync] = tokens
+        self.starts[first:resync] = starts
+        self.ends[first:resync] = ends
+        self.reaches[first:resync] = reaches
+
+        self.text = text
+        self.error = error
+        self.shifted = first + len(tokens)
+        self.delta += delta
+
+        # keep the reaches growing: the new tokens may have read further than the old tokens after them
+        reach = self.reaches[first - 1] if first > 0 else -1
+        for i in range(first, len(self.tokens)):
+            value = self.offset(self.reaches, i)
+            if value >= reach and i >= self.shifted:
+                break
+
+            reach = max(reach, value)
+            self.reaches[i] = reach if i < self.shifted else reach - self.delta
+
+        return first, resync - first, len(tokens)
@@ -0,0 +1,29 @@
+from .NFA import NFA
+from .Regex import Regex
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Empty(Regex):
+    # the regex which matches nothing
+
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # the final state cannot be reached
+        return nfa.add_state(), nfa.add_state()
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        return False, set(), set()
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return []
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return self
+
+    def utf8(self) -> Regex:
+        return self
+
+    def nullable(self) -> bool:
+        return False
+
+    def derivative(self, c: str) -> Regex:
+        return self
@@ -0,0 +1,36 @@
+from .NFA import NFA
+from .NFA import EPSILON
+from .Regex import Regex
+from .Empty import Empty
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Epsilon(Regex):
+    # the regex which only matches the empty word
+
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        #  (start) -----ε----> (final)
+        start = nfa.add_state()
+        final = nfa.add_state()
+
+        nfa.add_transition(start, EPSILON, final)
+
+        return start, final
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        return True, set(), set()
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return []
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return self
+
+    def utf8(self) -> Regex:
+        return self
+
+    def nullable(self) -> bool:
+        return True
+
+    def derivative(self, c: str) -> Regex:
+        return Empty()
@@ -0,0 +1,80 @@
+from .NFA import NFA, EPSILON
+from .Regex import Regex, parse_regex
+from .Complement import Complement
+from dataclasses import dataclass, field, fields
+
+@dataclass
+class Fragments:
+    # a cache of the rules of specs: their regexes, parsed and simplified, by regex string, and the nfas of the
+    # regexes, see Lexer.build_nfa. a lexer keeps its fragments, so changing a rule only parses and builds the nfa
+    # of that rule (see Lexer.add_rule), and lexers with rules in common can share them
+
+    # maps (regex string, binary) to the simplified regex, over the bytes of the utf-8 encodings in binary mode
+    regexes: dict[tuple[str, bool], Regex] = field(default_factory=dict)
+
+    # maps (regex, construction, alphabet) to the nfa of the regex. the alphabet is only part of the key for the
+    # regexes with a negated class, the only leaves whose transitions depend on it; it is None for the others
+    nfas: dict[tuple[Regex, str, frozenset[str] | None], NFA[int]] = field(default_factory=dict)
+
+    # the simplified subtrees of all the regexes, so that equal subtrees are shared, see Regex.simplify
+    nodes: dict[Regex, Regex] = field(default_factory=dict)
+
+    def prune(self, rules: list[tuple[str, bool]]) -> None:
+        # forget everything which is not needed by the given (regex string, binary) rules: the regexes of other
+        # rules, their nfas and their subtrees, so that the fragments of a spec which is edited for a long time
+        # do not grow with every rule it ever had. fragments shared with other lexers lose the rules of these
+        # lexers too, which are then parsed and built again when needed
+        self.regexes = {key: self.regexes[key] for key in rules if key in self.regexes}
+
+        kept = set(self.regexes.values())
+        self.nfas = {key: nfa for key, nfa in self.nfas.items() if key[0] in kept}
+
+        # the subtrees of the kept regexes, walked without recursion
+        nodes = {}
+        stack = list(kept)
+
+        while len(stack) > 0:
+            regex = stack.pop()
+            if regex in nodes:
+                continue
+
+            nodes[regex] = regex
+            stack.extend(value for value in (getattr(regex, f.name) for f in fields(regex)) if isinstance(value, Regex))
+
+        self.nodes = nodes
+
+    def regex(self, string: str, binary: bool) -> Regex:
+        regex = self.regexes.get((string, binary))
+
+        if regex is None:
+            regex = parse_regex(string).simplify(self.nodes)
+
+            if binary:
+                regex = regex.utf8().simplify(self.nodes)
+
+            self.regexes[(string, binary)] = regex
+
+        return regex
+
+    def nfa(self, regex: Regex, representatives: set[str], construction: str) -> NFA[int]:
+        # the nfa of the regex alone, whose initial state 0 has no incoming transition. its transitions are on all
+        # the characters of the leaves, except for the negated classes, which match the given representatives
+        negated = any(isinstance(characters, Complement) for characters in regex.character_sets())
+        key = (regex, construction, frozenset(representatives) if negated else None)
+
+        nfa = self.nfas.get(key)
+
+        if nfa is None:
+            nfa = NFA(set(representatives), set(), 0, {}, set())
+            nfa.q0 = nfa.add_state()
+
+            if construction == 'glushkov':
+                nfa.F = regex.build_glushkov(nfa, nfa.q0)
+            else:
+                start, final = regex.build(nfa)
+                nfa.add_transition(nfa.q0, EPSILON, start)
+                nfa.F = {final}
+
+            self.nfas[key] = nfa
+
+        return nfa
@@ -0,0 +1,276 @@
+from .BitNFA import BitNFA
+from array import array
+from dataclasses import dataclass, field
+
+# estimated memory used by a cached state (the object, its entry in the cache, its transitions dictionary and its
+# set of sources, without the bitset) and by a cached transition (its entry in the transitions of its source and
+# in the sources of its target), in bytes
+STATE_BYTES = 500
+TRANSITION_BYTES = 200
+
+@dataclass(slots=True, eq=False)
+class LazyState:
+    # a state of the lazy dfa: a set of nfa states, as a bitset
+    mask: int
+
+    # the index of the token recognised in this state, or -1 if the state is not final
+    token: int
+
+    # true if no final state can be reached from this state
+    dead: bool
+
+    # the transitions computed so far, from the representative of a character class to the next state
+    nexts: dict[str, 'LazyState'] = field(default_factory=dict)
+
+    # the transitions to this state, as (state, representative) pairs, so that they are removed with the state
+    sources: set[tuple['LazyState', str]] = field(default_factory=set)
+
+    # set when the state is used, cleared when the clock hand passes over it; see LazyDFA.evict
+    referenced: bool = True
+
+@dataclass
+class LazyDFA:
+    # simulates the dfa of an nfa without building it, like the dfa cache of RE2: the states of the dfa (sets of
+    # nfa states) and their transitions are computed the first time scan needs them, and kept in a cache using at
+    # most about 'budget' bytes. when the cache is full, states are evicted with the clock algorithm, an
+    # approximation of evicting the least recently used state. memory use is bounded even for specs whose
+    # complete dfa has exponentially many states, and the work per character is a dictionary lookup as long as
+    # the states used by the input fit in the cache
+    nfa: BitNFA
+
+    # maps every character of the alphabet to the representative of its class, the characters of the nfa
+    representatives: dict[str, str]
+
+    # the representative of the characters which are not in representatives, if a negated class matches them
+    other: str | None
+
+    # finals[token] is the bitset of the final nfa states of the token with this index in the spec
+    finals: list[int]
+
+    # the bitset of the nfa states from which a final state can be reached
+    live: int
+
+    # the memory available for the cached states and transitions, in bytes
+    budget: int
+
+    # the cache: maps the bitset of a state to the state, ordered for the clock algorithm
+    states: dict[int, LazyState] = field(default_factory=dict)
+
+    # the estimated memory used by the cache
+    used: int = 0
+
+    # transitions found in the cache, transitions computed, states evicted and times the cache was emptied
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    resets: int = 0
+
+    def __post_init__(self) -> None:
+        # the initial state is kept outside of the cache, so scan always has it
+        self.q0 = self.make_state(self.nfa.q0)
+
+    def make_state(self, mask: int) -> LazyState:
+        token = next((index for index, final in enumerate(self.finals) if final & mask), -1)
+
+        return LazyState(mask, token, mask & self.live == 0)
+
+    def cost(self, mask: int) -> int:
+        return STATE_BYTES + (mask.bit_length() + 7) // 8
+
+    def reset(self) -> None:
+        # empty the cache; the states held by a running scan are added back when they are used
+        for state in self.states.values():
+            state.nexts = {}
+            state.sources = set()
+
+        self.states = {}
+        self.used = 0
+        self.resets += 1
+
+    def evict(self) -> None:
+        # the clock algorithm: the states are kept in a circle (the order of the dictionary), and the hand
+        # (its first state) moves over the states which were used since it last passed, clearing their flag,
+        # until it finds one which was not used
+        while True:
+            mask = next(iter(self.states))
+            state = self.states.pop(mask)
+
+            if not state.referenced:
+                break
+
+            state.referenced = False
+            self.states[mask] = state
+
+        # drop the transitions from and to the state, so that no cached state refers to it anymore: a state
+        # computed again later is a new object, and the evicted one is freed. a running scan may still hold it:
+        # without transitions, it is added back when used
+        transitions = len(state.nexts)
+
+        for c, target in state.nexts.items():
+            if target is not state:
+                target.sources.discard((state, c))
+
+        for source, c in state.sources:
+            if source is not state:
+                del source.nexts[c]
+                transitions += 1
+
+        self.used -= self.cost(mask) + TRANSITION_BYTES * transitions
+        state.nexts = {}
+        state.sources = set()
+        self.evictions += 1
+
+    def transition(self, state: LazyState, c: str) -> LazyState:
+        # compute the transition from state on the representative c, adding it (and its states) to the cache
+        self.misses += 1
+
+        # a running scan may hold an evicted state whose set of nfa states is in the cache again, with the
+        # transition already computed
+        source = self.states.get(state.mask)
+        if source is not None and c in source.nexts:
+            return source.nexts[c]
+
+        nexts = 0
+        mask = state.mask
+        moves = self.nfa.moves
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            nexts |= moves[low.bit_length() - 1].get(c, 0)
+
+        # make room for the transition and for the states which are not in the cache. the hand may evict the
+        # states of the transition itself, so they are looked up again after every eviction. if the budget is too
+        # small for a single transition, the cache goes over it
+        while True:
+            source = self.states.get(state.mask)
+            target = self.states.get(nexts)
+
+            needed = TRANSITION_BYTES
+            if source is None:
+                needed += self.cost(state.mask)
+            if target is None and nexts != state.mask:
+                needed += self.cost(nexts)
+
+            if self.used + needed <= self.budget or len(self.states) == 0:
+                break
+
+            self.evict()
+
+            # the hand evicted every state: the cache was emptied, like the reset of the dfa cache of RE2
+            if len(self.states) == 0:
+                self.resets += 1
+
+        if source is None:
+            source = state
+            source.nexts = {}
+            source.sources = set()
+            self.states[state.mask] = source
+
+        target = self.states.get(nexts)
+        if target is None:
+            # scan always starts from q0, so a set of nfa states equal to it is the same object
+            target = self.q0 if nexts == self.q0.mask else self.make_state(nexts)
+            target.nexts = {}
+            target.sources = set()
+            self.states[nexts] = target
+
+        source.nexts[c] = target
+        target.sources.add((source, c))
+        self.used += needed
+
+        return target
+
+    def resume(self, word: str, i: int, state: LazyState) -> tuple[int, LazyState | None, int, int]:
+        # same as Lexer.resume, stepping through the cached states
+        representatives = self.representatives
+        other = self.other
+
+        lastAcceptedToken = -1
+        lastAcceptedIndex = -1
+
+        length = len(word)
+        while i < length:
+            c = representatives.get(word[i], other)
+            if c is None:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            target = state.nexts.get(c)
+            if target is None:
+                target = self.transition(state, c)
+            else:
+                self.hits += 1
+
+            state = target
+            state.referenced = True
+
+            if state.dead:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            if state.token != -1:
+                lastAcceptedIndex = i
+                lastAcceptedToken = state.token
+
+            i += 1
+
+        return i, state, lastAcceptedIndex, lastAcceptedToken
+
+    def scan(self, word: str, index: int, tokens: array, starts: array, ends: array,
+             final: bool = True, until: int | None = None, reaches: array | None = None) -> tuple[int, int]:
+        # same as Lexer.scan, stepping through the cached states instead of the transition table
+        representatives = self.representatives
+        other = self.other
+        q0 = self.q0
+
+        length = len(word)
+        until = length if until is None else min(until, length)
+
+        hits = 0
+
+        while index < until:
+            state = q0
+            lastAcceptedToken = -1
+            lastAcceptedIndex = -1
+
+            i = index
+            while i < length:
+                c = representatives.get(word[i], other)
+                if c is None:
+                    break
+
+                target = state.nexts.get(c)
+                if target is None:
+                    target = self.transition(state, c)
+                else:
+                    hits += 1
+
+                state = target
+                state.referenced = True
+
+                if state.dead:
+                    break
+
+                if state.token != -1:
+                    lastAcceptedIndex = i
+                    lastAcceptedToken = state.token
+
+                i += 1
+            else:
+                if not final:
+                    self.hits += hits
+                    return index, -1
+
+            if lastAcceptedIndex == -1:
+                self.hits += hits
+                return index, i
+
+            tokens.append(lastAcceptedToken)
+            starts.append(index)
+            ends.append(lastAcceptedIndex + 1)
+
+            if reaches is not None:
+                reaches.append(i)
+
+            index = lastAcceptedIndex + 1
+
+        self.hits += hits
+        return index, -1
@@ -1,140 +1,1145 @@
 from .DFA import DFA
+from .LazyDFA import LazyDFA
+from .BitNFA import BitNFA
+from .NFASimulator import NFASimulator
 from .NFA import NFA
+from .TransitionTable import TransitionTable
+from .TransitionTable import VERSION
 from .NFA import EPSILON
-from .Regex import parse_regex
+from .Regex import Regex, alphabet_classes, brzozowski
+from .Complement import Complement, representative
+from .Batch import Batch
+from .Spans import Spans
+from .Document import Document
+from .Fragments import Fragments
+from .Profile import Profile
+from .StreamLexer import StreamLexer
+from array import array
+from bisect import bisect_left
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass
 
+import asyncio
+import codecs
+import copy
+import dataclasses
+import hashlib
+import os
+import time
+
 @dataclass
 class Lexer:
     spec: list[tuple[str, str]]
-    dfa: DFA[str]
+    dfa: DFA | None
+    table: TransitionTable | None
+    linear: bool
+    lazy: LazyDFA | None
+    simulator: NFASimulator | None
+    compiled: Callable | None
+    binary: bool
+
+    # the parsed rules and their nfas, see Fragments
+    fragments: Fragments
+
+    # the options the lexer was built with, to build it again when the spec changes
+    options: dict
+
+    # when the dfa was built by the subset construction and not minimized: the sets of nfa states of every rule
+    # and of its final states, and the character classes of the columns of the table; see add_rule
+    parts: list[tuple[frozenset[int], frozenset[int]]] | None
+    classes: list[frozenset[str] | Complement] | None
+
+    # the measures of the build and of the scans of the lexer if it was built with profile set, see Profile
+    profile: Profile | None
 
     # initialisation should convert the specification to a dfa which will be used in the lex method
     # the specification is a list of pairs (TOKEN_NAME:REGEX)
-    def __init__(self, spec: list[tuple[str, str]]) -> None:
+    # if minimize is set, the dfa is minimized before building the transition table used by lex
+    # if cache is the path of a directory, the transition table is saved there and loaded back by the next lexer
+    # built from the same specification; a lexer loaded from the cache has no dfa, only the table
+    # if linear is set, lexing takes linear time even on inputs which make the longest match rule backtrack a lot,
+    # at the cost of remembering the states which failed to reach a longer match (see scan_linear)
+    # construction selects how the regexes are converted to an nfa: 'thompson' (Thompson's construction) or
+    # 'glushkov' (the position automaton: one state per character of the regexes and no epsilon transitions),
+    # or 'brzozowski' to build the dfa directly from the derivatives of the regexes, without an nfa
+    # if lazy is a number of bytes, the dfa is not built: lex simulates the nfa, computing the dfa states it needs
+    # on the fly and caching them in at most that much memory (see LazyDFA); the lexer then has no dfa and no
+    # transition table, and minimize and cache have no effect
+    # if simulate is set, no dfa is built either: lex simulates the nfa itself, moving the set of active nfa states
+    # on every character (see NFASimulator). the build is as cheap as building the nfa, and lexing takes time
+    # proportional to the size of the nfa per character, even for specs whose dfa would be exponentially large;
+    # combined with linear, the whole input is split in O(n * m) time for an input of length n and an nfa of m states
+    # if fragments is given, the parsed rules and their nfas are taken from it when they are there, see Fragments
+    # if profile is set, the lexer measures the phases of its build and the size of its automata, and counts what
+    # its scans do (see profiled_scan) in its profile; otherwise nothing is measured
+    # if binary is set, the lexer splits bytes-like objects (bytes, bytearray, memoryview, mmap.mmap) instead of
+    # strings: the automata read bytes, and the rules match the utf-8 encodings of the words they describe. the
+    # offsets of the tokens are byte offsets, and the lexemes are slices of the input
+    def __init__(self, spec: list[tuple[str, str]], minimize: bool = False, cache: str | None = None,
+                 linear: bool = False, construction: str = 'thompson', lazy: int | None = None,
+                 binary: bool = False, simulate: bool = False, fragments: Fragments | None = None,
+                 profile: bool = False) -> None:
+        if construction not in ['thompson', 'glushkov', 'brzozowski']:
+            raise ValueError(f'unknown construction: {construction}')
+
+        if lazy is not None and (linear or construction == 'brzozowski'):
+            raise ValueError('the lazy dfa cannot be combined with linear lexing or the brzozowski construction')
+
+        if simulate and (lazy is not None or construction == 'brzozowski'):
+            raise ValueError('the nfa simulation cannot be combined with the lazy dfa or the brzozowski construction')
+
         self.spec = spec
+        self.linear = linear
+        self.lazy = None
+        self.simulator = None
+        self.compiled = None
+        self.binary = binary
+        self.fragments = fragments if fragments is not None else Fragments()
+        self.options = {'minimize': minimize, 'cache': cache, 'linear': linear, 'construction': construction,
+                        'lazy': lazy, 'binary': binary, 'simulate': simulate, 'profile': profile}
+        self.parts = None
+        self.classes = None
+        self.profile = Profile() if profile else None
 
-        # introduce a new, initial state of the nfa
-        q0 = '0'
-        S = set()
-        K = set(q0)
-        F = set()
-        d = {}
+        if simulate:
+            self.dfa = None
+            self.table = None
+            self.simulator = NFASimulator(*self.bit_nfa(self.parse_spec(), construction, self.fragments,
+                                                        self.profile))
+
+            if binary:
+                self.simulator.representatives = {ord(c): value for c, value in self.simulator.representatives.items()}
+
+            return
+
+        if lazy is not None:
+            self.dfa = None
+            self.table = None
+            self.lazy = self.lazy_dfa(self.parse_spec(), construction, lazy, self.fragments, self.profile)
+
+            if binary:
+                self.lazy.representatives = {ord(c): value for c, value in self.lazy.representatives.items()}
+
+            return
+
+        if cache is not None:
+            path = os.path.join(cache, self.cache_key(minimize, construction) + '.lexer')
 
-        for index, (_, regex) in enumerate(spec):
-            # parse regex into an NFA
-            nfa = parse_regex(regex).thompson()
+            table = self.load_table(path)
+            self.lap('cache')
 
-            # remap states to remember the position of the token in the list
-            # each state will have the form: <nfa_index>_<state_number>
-            nfa = nfa.remap_states(lambda state: str(index) + '_' + str(state))
+            if table is not None:
+                self.dfa = None
+                self.table = table.for_bytes() if binary else table
+                self.measure_table()
+                return
 
-            # remap final states to: <nfa_index>_<state_number>_f
-            for finalState in list(nfa.F):
-                f = finalState + "_f"
+        regexes = self.parse_spec()
 
-                # update nfa.K, nfa.F
-                nfa.K.remove(finalState)
-                nfa.K.add(f)
+        # characters matched by the same regex leaves behave the same in the automaton, so the nfa only keeps
+        # the transitions on one representative character per class; this makes the dfa alphabet (and the
+        # columns of the transition table) one entry per class instead of one per character
+        classes = alphabet_classes(regexes)
+        representatives = {representative(characters) for characters in classes}
 
-                nfa.F.remove(finalState)
-                nfa.F.add(f)
+        if construction == 'brzozowski':
+            # the states are the vectors of the derivatives of the regexes; a state recognises the first regex
+            # of the spec whose derivative matches the empty word
+            self.dfa = brzozowski(regexes, representatives)
+            token = lambda state: next((index for index, regex in enumerate(state) if regex.nullable()), -1)
 
-                # update nfa.d, replace finalState with newly remapped f
-                for (state, c), nextStatesSet in list(nfa.d.items()):
-                    if finalState in nextStatesSet:
-                        nextStatesSet.remove(finalState)
-                        nextStatesSet.add(f)
+            self.lap('brzozowski')
+            self.measure_dfa('dfa')
+        else:
+            self.dfa, token, self.parts = self.subset_construction(regexes, representatives, construction,
+                                                                   self.fragments, self.profile)
+            self.classes = classes
+            self.measure_dfa('dfa')
 
-                        nfa.d[(state, c)] = nextStatesSet
+        if minimize:
+            # only merge states which recognise the same token, so the lexer output does not change;
+            # all the states merged into a block recognise the same token, so any of them can be asked
+            stateToken = token
+            self.dfa = self.dfa.minimize(stateToken)
+            token = lambda block: stateToken(next(iter(block)))
 
-                    if state == finalState:
-                        nfa.d[(f, c)] = nfa.d[(state, c)]
-                        del nfa.d[(state, c)]
+            self.parts = None
+            self.classes = None
 
-            # add the states from the current nfa to K
-            K |= nfa.K
+            self.lap('minimize')
+            self.measure_dfa('minimized')
 
-            # add the final state of the current nfa to F
-            F |= nfa.F
+        # renumber the dfa states to dense integers and build the flat transition table used by lex.
+        # the token recognised by each state and whether the state is dead are computed once here, so lex does
+        # constant work per character
+        self.table = self.dfa.compile(token, classes)
+        self.lap('compile')
 
-            d |= nfa.d
-            S |= nfa.S
+        if cache is not None:
+            self.save_table(path)
+            self.lap('cache')
 
-            # add an epsilon transition from the initial state q0 to the current nfa's initial state
-            initialStateSet = set() if (q0, EPSILON) not in d else d[(q0, EPSILON)]
-            d[((q0, EPSILON))] = initialStateSet | {nfa.q0}
+        if binary:
+            self.table = self.table.for_bytes()
+
+        self.measure_table()
+
+    # the current phase of the build ended, see Profile.lap
+    def lap(self, phase: str) -> None:
+        if self.profile is not None:
+            self.profile.lap(phase)
+
+    # record the size of the dfa in the profile, under the given name
+    def measure_dfa(self, name: str) -> None:
+        if self.profile is not None:
+            self.profile.sizes[f'{name}_states'] = len(self.dfa.K)
+            self.profile.sizes[f'{name}_transitions'] = len(self.dfa.d)
+
+    # record the size of the transition table in the profile
+    def measure_table(self) -> None:
+        if self.profile is not None:
+            self.profile.sizes['table_states'] = len(self.table.accepting)
+            self.profile.sizes['table_columns'] = self.table.width
+
+    # parse the regexes of the spec and simplify them, sharing the equal subtrees of the rules; in binary mode,
+    # the regexes are converted to regexes over the bytes of the utf-8 encodings. the regexes are cached in the
+    # fragments of the lexer
+    def parse_spec(self) -> list[Regex]:
+        regexes = [self.fragments.regex(regex, self.binary) for _, regex in self.spec]
+        self.lap('parse')
+
+        return regexes
+
+    # build the nfa of the regexes with the given construction and convert it to a dfa over the representatives
+    # of the character classes; returns the dfa, a function giving the index of the token recognised by a state
+    # and the states of the nfa of every rule, see build_nfa
+    @staticmethod
+    def subset_construction(regexes: list[Regex], representatives: set[str], construction: str,
+                            fragments: Fragments | None = None,
+                            profile: Profile | None = None) -> tuple[DFA, Callable, list]:
+        nfa, tokens, parts = Lexer.build_nfa(regexes, representatives, construction, fragments, profile)
 
         # transform nfa to dfa using subset construction algorithm
-        self.dfa = NFA(S, K, q0, d, F).subset_construction()
+        # the alphabet of the dfa only contains the representatives of the character classes
+        dfa = nfa.subset_construction()
+
+        if profile is not None:
+            profile.lap('subset construction')
+
+        return dfa, Lexer.state_token(tokens), parts
+
+    # a function giving the token recognised by a dfa state (a set of nfa states): the first token in the spec
+    # among its final nfa states, given the token of every final nfa state
+    @staticmethod
+    def state_token(tokens: dict[int, int]) -> Callable:
+        return lambda state: min((tokens[q] for q in state if q in tokens), default=-1)
+
+    # the lazy dfa of the regexes, over the representatives of the character classes, caching at most budget bytes
+    @staticmethod
+    def lazy_dfa(regexes: list[Regex], construction: str, budget: int, fragments: Fragments | None = None,
+                 profile: Profile | None = None) -> LazyDFA:
+        return LazyDFA(*Lexer.bit_nfa(regexes, construction, fragments, profile), budget)
+
+    # the nfa of the regexes over bitsets of states, for the automata which simulate it. returns the nfa, the map
+    # from every character to the representative of its class, the representative of the other characters (if
+    # a negated class matches them), the bitsets of the final states of every token and the bitset of live states
+    @staticmethod
+    def bit_nfa(regexes: list[Regex], construction: str, fragments: Fragments | None = None,
+                profile: Profile | None = None) -> tuple[BitNFA, dict[str, str], str | None, list[int], int]:
+        classes = alphabet_classes(regexes)
+
+        # the characters of a negated class are not listed: all the characters which are not in the dictionary
+        # belong to the class of the other characters
+        representatives = {c: min(characters) for characters in classes if not isinstance(characters, Complement)
+                           for c in characters}
+        other = next((characters.representative() for characters in classes if isinstance(characters, Complement)), None)
+
+        nfa, tokens, _ = Lexer.build_nfa(regexes, {representative(characters) for characters in classes}, construction,
+                                         fragments, profile)
+        bits = nfa.to_bits()
+
+        if profile is not None:
+            profile.lap('bits')
+
+        finals = [0] * len(regexes)
+        for i, state in enumerate(bits.states):
+            if state in tokens:
+                finals[tokens[state]] |= 1 << i
+
+        return bits, representatives, other, finals, bits.live()
+
+    # build the nfas of all the regexes into a single nfa over the representatives of the character classes.
+    # returns the nfa and a dictionary mapping every final state to the index of the token it recognises
+    @staticmethod
+    def build_nfa(regexes: list[Regex], representatives: set[str], construction: str,
+                  fragments: Fragments | None = None, profile: Profile | None = None) -> tuple[NFA, dict[int, int], list]:
+        # build the nfas of all the regexes into a single nfa, with a new initial state 0. the alphabet is known
+        # beforehand, for the negated character classes. the nfa of each regex is built alone (or taken from the
+        # fragments) and copied into the nfa; also returns the sets of states and of final states of every regex
+        fragments = fragments if fragments is not None else Fragments()
+
+        nfa = NFA(set(representatives), {0}, 0, {}, set())
+
+        # maps every final nfa state to the index of the token it recognises
+        tokens = {}
+        parts = []
+
+        nfas = [fragments.nfa(regex, representatives, construction) for regex in regexes]
+
+        if profile is not None:
+            profile.lap('nfa')
+
+        for index, fragment in enumerate(nfas):
+            states, finals = Lexer.add_fragment(nfa, fragment, len(nfa.K) - 1)
+            parts.append((states, finals))
+
+            for final in finals:
+                tokens.setdefault(final, index)
+
+        if profile is not None:
+            profile.lap('merge')
+            profile.sizes['nfa_states'] = len(nfa.K)
+            profile.sizes['nfa_transitions'] = sum(len(targets) for targets in nfa.d.values())
+
+        return nfa, tokens, parts
+
+    # copy the nfa of a regex alone (see Fragments.nfa) into nfa: its initial state becomes the initial state of
+    # nfa (for thompson's construction, it only has an epsilon transition to the initial state of the regex; the
+    # glushkov nfas of all the regexes share it), and its other states q become q + offset. the transitions on
+    # characters which are not the representative of their class are dropped. returns the new states and the
+    # final states of the copy
+    @staticmethod
+    def add_fragment(nfa: NFA, fragment: NFA, offset: int) -> tuple[frozenset[int], frozenset[int]]:
+        f = lambda state: nfa.q0 if state == fragment.q0 else state + offset
+
+        for (state, c), targets in fragment.d.items():
+            if c == EPSILON or c in nfa.S:
+                nfa.d.setdefault((f(state), c), set()).update(f(target) for target in targets)
+
+        states = frozenset(f(state) for state in fragment.K if state != fragment.q0)
+        finals = frozenset(f(state) for state in fragment.F)
+
+        nfa.K |= states
+        nfa.F |= finals
+
+        return states, finals
+
+    # add a rule to the end of the spec, with the lowest priority. only the new regex is parsed and only its nfa is
+    # built. if the lexer has the dfa of the subset construction, the new dfa is its product with the dfa of the
+    # new rule alone: a state of the new dfa is the union of the two sets of nfa states. while the new rule cannot
+    # match anymore, the product only renames the states of the old dfa, so the subset construction only runs on
+    # the nfa of the new rule. otherwise, the lexer is built again from the cached fragments
+    def add_rule(self, name: str, regex: str) -> None:
+        spec = self.spec + [(name, regex)]
+
+        if self.parts is None:
+            self.rebuild(spec)
+            return
+
+        if self.profile is not None:
+            self.profile.start()
+
+        regexes = [self.fragments.regex(regex, self.binary) for _, regex in spec]
+        classes = alphabet_classes(regexes)
+        representatives = {representative(characters) for characters in classes}
+        self.lap('parse')
+
+        # the new classes split the old ones: every character of a new class behaves like the representative of
+        # its old class in the old dfa, or like a character which does not match any old rule
+        old = {c: next((representative(characters) for characters in self.classes if c in characters), None)
+               for c in representatives}
+
+        # the dfa of the new rule alone, over nfa states numbered after the states of the old rules. its initial
+        # state is the initial state 0 of the nfa of the spec, see build_nfa
+        nfa = NFA(set(representatives), {0}, 0, {}, set())
+        offset = max((max(states) for states, _ in self.parts if states), default=0)
+        part = self.add_fragment(nfa, self.fragments.nfa(regexes[-1], representatives, self.options['construction']),
+                                 offset)
+        self.lap('nfa')
+
+        rule = nfa.subset_construction()
+
+        # maps the pairs of states reached in the two dfas to the states of the product, their unions
+        sink = frozenset()
+        q0 = self.dfa.q0 | rule.q0
+        pairs = {(self.dfa.q0, rule.q0): q0}
+        d = {}
+        stack = [(self.dfa.q0, rule.q0)]
+
+        while len(stack) > 0:
+            state, ruleState = stack.pop()
+            union = pairs[(state, ruleState)]
+
+            for c in representatives:
+                pair = (self.dfa.d.get((state, old[c]), sink) if old[c] is not None else sink,
+                        rule.d.get((ruleState, c), sink))
+
+                target = pairs.get(pair)
+                if target is None:
+                    target = pairs[pair] = pair[0] | pair[1]
+                    stack.append(pair)
+
+                d[(union, c)] = target
+
+        self.lap('subset construction')
+
+        self.spec = spec
+        self.parts = self.parts + [part]
+        self.classes = classes
+        self.update(DFA(representatives, set(pairs.values()), q0, d, set()))
+
+    # remove the rule with the given name from the spec. if the lexer has the dfa of the subset construction, no
+    # automaton is built: the nfa of the rule is disjoint from the others, so removing its states from the states
+    # of the old dfa gives the states of the new dfa, and the transitions between them. otherwise, the lexer is
+    # built again from the cached fragments. the fragments of the rules which are not in the spec anymore are then
+    # dropped, see Fragments.prune
+    def remove_rule(self, name: str) -> None:
+        index = next((i for i, (rule, _) in enumerate(self.spec) if rule == name), None)
+        if index is None:
+            raise ValueError(f'no rule named {name}')
+
+        spec = self.spec[:index] + self.spec[index + 1:]
+
+        if self.parts is None:
+            self.rebuild(spec)
+            self.fragments.prune([(regex, self.binary) for _, regex in self.spec])
+            return
+
+        if self.profile is not None:
+            self.profile.start()
+
+        removed = self.parts[index][0]
+
+        regexes = [self.fragments.regex(regex, self.binary) for _, regex in spec]
+        classes = alphabet_classes(regexes)
+        representatives = {representative(characters) for characters in classes}
+        self.lap('parse')
+
+        # the new classes are unions of old ones, whose characters behave the same in the rules which are left
+        old = {c: next(representative(characters) for characters in self.classes if c in characters)
+               for c in representatives}
+
+        # maps the states of the old dfa to their images, the states of the new dfa; different old states may
+        # have the same image, and then the same transitions, so only the first one found is explored
+        sink = frozenset()
+        q0 = self.dfa.q0 - removed
+        images = {self.dfa.q0: q0}
+        K = {q0}
+        d = {}
+        stack = [self.dfa.q0]
+
+        while len(stack) > 0:
+            state = stack.pop()
+            image = images[state]
+
+            for c in representatives:
+                target = self.dfa.d.get((state, old[c]), sink)
+
+                targetImage = images.get(target)
+                if targetImage is None:
+                    targetImage = images[target] = target - removed
+
+                    if targetImage not in K:
+                        K.add(targetImage)
+                        stack.append(target)
+
+                d[(image, c)] = targetImage
+
+        self.lap('subset construction')
+
+        self.spec = spec
+        self.parts = self.parts[:index] + self.parts[index + 1:]
+        self.classes = classes
+        self.update(DFA(representatives, K, q0, d, set()))
+        self.fragments.prune([(regex, self.binary) for _, regex in self.spec])
+
+    # replace the dfa by one built by add_rule or remove_rule, and build its transition table
+    def update(self, dfa: DFA) -> None:
+        tokens = {}
+        for index, (_, finals) in enumerate(self.parts):
+            for final in finals:
+                tokens.setdefault(final, index)
+
+        dfa.F = {state for state in dfa.K if any(q in tokens for q in state)}
+        self.dfa = dfa
+        self.measure_dfa('dfa')
+
+        self.table = dfa.compile(self.state_token(tokens), self.classes)
+        self.lap('compile')
+
+        cache = self.options['cache']
+        if cache is not None:
+            self.save_table(os.path.join(cache, self.cache_key(False, self.options['construction']) + '.lexer'))
+            self.lap('cache')
+
+        if self.binary:
+            self.table = self.table.for_bytes()
+
+        self.measure_table()
+
+        if self.compiled is not None:
+            self.compile()
+
+    # build the lexer again for a new spec, with the same options, reusing the parsed rules and their nfas. the
+    # profile keeps the counters of the scans, and gets the measures of the new build
+    def rebuild(self, spec: list[tuple[str, str]]) -> None:
+        compiled = self.compiled is not None
+        profile = self.profile
+
+        self.__init__(spec, fragments=self.fragments, **self.options)
+
+        if profile is not None:
+            profile.phases = self.profile.phases
+            profile.sizes = self.profile.sizes
+            self.profile = profile
+
+        if compiled:
+            self.compile()
+
+    # generate the source of a python module with the spec of this lexer (SPEC) and a scan function specialized
+    # for its transition table, see TransitionTable.to_source. the module can be written to a file and imported
+    # later to build the lexer with from_module, without building any automaton
+    def generate_source(self) -> str:
+        if self.table is None:
+            raise ValueError('only a lexer with a transition table can be compiled')
+
+        if self.linear:
+            raise ValueError('the compiled scan function does not lex in linear time')
+
+        return '\n'.join([
+            '# generated by Lexer.generate_source, do not edit',
+            '',
+            f'SPEC = {self.spec!r}',
+            f'BINARY = {self.binary!r}',
+            '',
+            self.table.to_source(),
+        ])
+
+    # replace the scan loop of this lexer by the specialized function of generate_source, which is faster.
+    # returns the function, or None if the source is too large for the python compiler: the lexer then keeps
+    # scanning with its transition table
+    def compile(self) -> Callable | None:
+        namespace = {}
+
+        try:
+            exec(self.generate_source(), namespace)
+        except (RecursionError, MemoryError, SyntaxError):
+            self.compiled = None
+            return None
+
+        self.compiled = namespace['scan']
+
+        return self.compiled
+
+    # build a lexer from a module generated by generate_source, e.g. after importing it
+    @staticmethod
+    def from_module(module) -> 'Lexer':
+        lexer = Lexer.__new__(Lexer)
+
+        lexer.spec = module.SPEC
+        lexer.dfa = None
+        lexer.table = None
+        lexer.linear = False
+        lexer.lazy = None
+        lexer.simulator = None
+        lexer.compiled = module.scan
+        lexer.binary = module.BINARY
+        lexer.fragments = Fragments()
+        lexer.options = {'binary': module.BINARY}
+        lexer.parts = None
+        lexer.classes = None
+        lexer.profile = None
+
+        return lexer
+
+    # the name of the cache file of this lexer: a hash of everything the transition table depends on
+    def cache_key(self, minimize: bool, construction: str) -> str:
+        return hashlib.sha256(repr((VERSION, minimize, construction, self.binary, self.spec)).encode()).hexdigest()
+
+    # read a cached transition table; returns None if there is no usable table at the given path
+    def load_table(self, path: str) -> TransitionTable | None:
+        try:
+            with open(path, 'rb') as file:
+                table = TransitionTable.from_bytes(file.read())
+        except (OSError, ValueError):
+            return None
+
+        # the tokens of the table must be rules of the spec
+        if max(table.accepting, default=-1) >= len(self.spec):
+            return None
+
+        return table
+
+    # write the transition table to the cache. the file is written under a temporary name and then renamed, so
+    # that another process never reads a partially written table. failing to write the cache is not an error,
+    # the next lexer will simply build its table again
+    def save_table(self, path: str) -> None:
+        temporary = f'{path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with open(temporary, 'wb') as file:
+                file.write(self.table.to_bytes())
+
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    # build the error returned by lex when no token matches at the given index of the word;
+    # line and character numbers are only computed here, so the lexing loop does not track newlines.
+    # if the word is a part of a longer text, line is the number of newlines before it and column the number of
+    # characters between the last of those newlines and the start of the word
+    # in binary mode, the positions are byte offsets
+    def error(self, word: str, index: int, line: int = 0, column: int = 0) -> list[tuple[str, str]]:
+        end = index >= len(word)
+
+        if self.binary:
+            # memoryview and mmap objects cannot count newlines: search a copy of the text before the error
+            word = bytes(word[:index + 1])
+            separator = b'\n'
+        else:
+            separator = '\n'
+
+        line += word.count(separator, 0, index + 1)
+
+        if end:
+            return [("", f"No viable alternative at character EOF, line {line}")]
+
+        newline = word.rfind(separator, 0, index + 1)
+        charIndex = index - newline - 1 if newline != -1 else column + index
+
+        return [("", f"No viable alternative at character {charIndex}, line {line}")]
+
+    # split the word into tokens, starting at the given index, using the longest match rule.
+    # for every token, the index of the token in the spec, the start and the end (exclusive) of the lexeme are
+    # appended to the tokens, starts and ends arrays.
+    # returns the index where scanning stopped and the index of the character where no token matched (-1 if none,
+    # len(word) if the word ended in the middle of a token). if final is False, the word is only a prefix of the
+    # input: scanning stops before a token which could still continue after the end of the word.
+    # if until is given, no token starting at or after that index is scanned.
+    # if reaches is given, the index of the last character read to find each token is appended to it (len(word) if
+    # the end of the word was reached): the token only depends on the word up to that character, see Document
+    def scan(self, word: str, index: int, tokens: array, starts: array, ends: array,
+             final: bool = True, until: int | None = None, reaches: array | None = None) -> tuple[int, int]:
+        if self.profile is not None and reaches is None:
+            return self.profiled_scan(word, index, tokens, starts, ends, final, until)
+
+        if self.compiled is not None and reaches is None:
+            return self.compiled(word, index, tokens, starts, ends, final, until)
+
+        if self.simulator is not None:
+            return self.simulator.scan(word, index, tokens, starts, ends, final, until, self.linear, reaches)
+
+        if self.linear:
+            return self.scan_linear(word, index, tokens, starts, ends, final, until, reaches)
+
+        if self.lazy is not None:
+            return self.lazy.scan(word, index, tokens, starts, ends, final, until, reaches)
 
-    # a state is a sink if all transitions are from and to the same state
-    def isSinkState(self, state: str) -> bool:
-        return all([self.dfa.d.get((state, c)) == state for c in self.dfa.S])
+        columns = self.table.columns
+        other = self.table.other if self.table.other != -1 else None
+        width = self.table.width
+        d = self.table.d
+        accepting = self.table.accepting
+        dead = self.table.dead
+        q0 = self.table.q0
+
+        length = len(word)
+        until = length if until is None else min(until, length)
+
+        while index < until:
+            state = q0
+            lastAcceptedToken = -1
+            lastAcceptedIndex = -1
+
+            # consume characters until reaching a sink state; the last final state seen gives the longest match
+            i = index
+            while i < length:
+                # a character which is not in the spec alphabet cannot continue the token
+                column = columns.get(word[i], other)
+                if column is None:
+                    break
+
+                state = d[state * width + column]
+
+                if dead[state]:
+                    break
+
+                if accepting[state] != -1:
+                    lastAcceptedIndex = i
+                    lastAcceptedToken = accepting[state]
+
+                i += 1
+            else:
+                # the word ended in the middle of a token which could continue in the rest of the input
+                if not final:
+                    return index, -1
+
+            # got to a sink state without previously getting to a final state -> lexer error
+            if lastAcceptedIndex == -1:
+                return index, i
+
+            tokens.append(lastAcceptedToken)
+            starts.append(index)
+            ends.append(lastAcceptedIndex + 1)
+
+            if reaches is not None:
+                reaches.append(i)
+
+            # continue with the character after the longest match
+            index = lastAcceptedIndex + 1
+
+        return index, -1
+
+    # the scan of a lexer with a profile: the same as scan, counting what it does in the profile. the scan records
+    # the reach of every token, the last character it read, which gives the number of characters read to find the
+    # token and the number of them read again by the next tokens. a compiled lexer runs the scan of its transition
+    # table instead of its compiled scan function, which cannot record the reaches. the scans of documents, which
+    # record the reaches themselves, are not counted
+    def profiled_scan(self, word: str, index: int, tokens: array, starts: array, ends: array,
+                      final: bool = True, until: int | None = None) -> tuple[int, int]:
+        first = len(tokens)
+        reaches = array('q')
+
+        start = time.perf_counter()
+        stop, error = self.scan(word, index, tokens, starts, ends, final, until, reaches)
+        seconds = time.perf_counter() - start
+
+        self.profile.count([name for name, _ in self.spec], len(word), index, stop, error, tokens, starts, ends,
+                           reaches, first, seconds)
+
+        return stop, error
+
+    # same as scan, in linear time. scan backtracks to the end of the longest match after reaching a sink state,
+    # so the characters after it are read again for the next token: with a spec like 'a*b|a' and a long run of
+    # a's, every token reads the whole run. this is the memoized longest match algorithm from Reps' "Maximal-munch
+    # tokenization in linear time": when a token is complete, every (state, position) pair reached after the end
+    # of the match is known to lead to a sink state without another final state, at a known position. when a
+    # later token reaches one of those pairs it stops scanning right away, so each pair is scanned at most once
+    def scan_linear(self, word: str, index: int, tokens: array, starts: array, ends: array,
+                    final: bool = True, until: int | None = None, reaches: array | None = None) -> tuple[int, int]:
+        columns = self.table.columns
+        other = self.table.other if self.table.other != -1 else None
+        width = self.table.width
+        d = self.table.d
+        accepting = self.table.accepting
+        dead = self.table.dead
+        q0 = self.table.q0
+
+        length = len(word)
+        states = len(accepting)
+
+        until = length if until is None else min(until, length)
+
+        # maps position * states + state to the position where scanning from that state stopped
+        failed = {}
+
+        while index < until:
+            state = q0
+            lastAcceptedToken = -1
+            lastAcceptedIndex = -1
+
+            # the (state, position) pairs reached while scanning this token
+            trail = []
+
+            i = index
+            while i < length:
+                column = columns.get(word[i], other)
+                if column is None:
+                    break
+
+                state = d[state * width + column]
+
+                if dead[state]:
+                    break
+
+                if accepting[state] != -1:
+                    lastAcceptedIndex = i
+                    lastAcceptedToken = accepting[state]
+
+                i += 1
+
+                # this state was reached at this position before, and no final state came after it
+                key = i * states + state
+                if key in failed:
+                    i = failed[key]
+                    break
+
+                trail.append(key)
+            else:
+                if not final:
+                    return index, -1
+
+            if lastAcceptedIndex == -1:
+                return index, i
+
+            # the pairs after the longest match did not lead to a final state before stopping at position i
+            boundary = (lastAcceptedIndex + 1) * states
+            for key in trail:
+                if key >= boundary:
+                    failed[key] = i
+
+            tokens.append(lastAcceptedToken)
+            starts.append(index)
+            ends.append(lastAcceptedIndex + 1)
+
+            # a known pair stands for the characters read from it the first time, up to position i
+            if reaches is not None:
+                reaches.append(i)
+
+            index = lastAcceptedIndex + 1
+
+        return index, -1
+
+    # the state from which every token is scanned, for resume; None if the lexer only has a compiled scan function,
+    # which cannot be resumed
+    def start_state(self) -> object | None:
+        if self.simulator is not None:
+            return self.simulator.nfa.q0
+
+        if self.lazy is not None:
+            return self.lazy.q0
+
+        return self.table.q0 if self.table is not None else None
+
+    # continue scanning a token from the given state (see start_state), at index i of the word: the token may have
+    # started in an earlier word, see StreamLexer. returns the index where the scan stopped, the state reached (None
+    # if the token cannot continue from there: no longer match can be found), and the index of the last character
+    # and the token of the longest match ending in this word (-1 if none)
+    def resume(self, word: str, i: int, state: object) -> tuple[int, object | None, int, int]:
+        if self.simulator is not None:
+            return self.simulator.resume(word, i, state)
+
+        if self.lazy is not None:
+            return self.lazy.resume(word, i, state)
+
+        columns = self.table.columns
+        other = self.table.other if self.table.other != -1 else None
+        width = self.table.width
+        d = self.table.d
+        accepting = self.table.accepting
+        dead = self.table.dead
+
+        lastAcceptedToken = -1
+        lastAcceptedIndex = -1
+
+        length = len(word)
+        while i < length:
+            column = columns.get(word[i], other)
+            if column is None:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            state = d[state * width + column]
+
+            if dead[state]:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            if accepting[state] != -1:
+                lastAcceptedIndex = i
+                lastAcceptedToken = accepting[state]
+
+            i += 1
+
+        return i, state, lastAcceptedIndex, lastAcceptedToken
 
     # this method splits the lexer into tokens based on the specification
     # the result is a list of tokens in the form (TOKEN_NAME, MATCHED_STRING)
     def lex(self, word: str) -> list[tuple[str, str]] | None:
-        state = self.dfa.q0
-        result = []
+        tokens, starts, ends = array('i'), array('q'), array('q')
 
-        lastStartIndex = 0
-        lastAcceptedToken = -1
-        lastAcceptedIndex = -1
+        _, error = self.scan(word, 0, tokens, starts, ends)
+        if error != -1:
+            return self.error(word, error)
 
-        charIndex = 0
-        index = 0
-        line = 0
-        lastNewLineIndex = -1
+        return [(self.spec[token][0], word[start:end]) for token, start, end in zip(tokens, starts, ends)]
 
-        while index < len(word):
-            c = word[index]
+    # split the word into tokens without copying the lexemes: the result holds the index of each token in the spec
+    # and the offsets of its lexeme in the word, which is only sliced when a token is accessed by index
+    def lex_spans(self, word: str) -> Spans:
+        spans = Spans(word, [name for name, _ in self.spec], array('i'), array('q'), array('q'))
 
-            # account newlines
-            if c == '\n' and lastNewLineIndex != index:
-                line += 1
-                lastNewLineIndex = index
+        _, error = self.scan(word, 0, spans.tokens, spans.starts, spans.ends)
+        if error != -1:
+            spans.error = self.error(word, error)[0][1]
 
-            charIndex = index - lastNewLineIndex - 1
+        return spans
 
-            # character c is not in the spec alphabet
-            if c not in self.dfa.S:
-                return [("", f"No viable alternative at character {charIndex}, line {line}")]
+    # split the word into tokens, keeping what is needed to split it again quickly after an edit: see Document.edit
+    def lex_document(self, word: str) -> Document:
+        if self.table is None and self.lazy is None and self.simulator is None:
+            raise ValueError('a lexer with only a compiled scan function cannot lex documents')
 
-            # continue to the next state and consume another character in the word
-            state = self.dfa.d.get((state, c))
-            
-            if self.isSinkState(state):
-                # if got to a sink state without previously getting to a final state -> lexer error
-                if lastAcceptedIndex == -1:
-                    return [("", f"No viable alternative at character {charIndex}, line {line}")]
+        # an edit builds a new text from the old one
+        if self.binary:
+            word = bytes(word)
 
-                # append to the result a tuple in the form (TOKEN_NAME, MATCHED_STRING)
-                result.append((self.spec[lastAcceptedToken][0], word[lastStartIndex : lastAcceptedIndex+1]))
+        return Document(self, word)
 
-                lastStartIndex = lastAcceptedIndex + 1
-                index = lastStartIndex
-                state = self.dfa.q0
-                lastAcceptedIndex = -1
-                lastAcceptedToken = -1
-                continue
-        
-            # final state reached
-            if state in self.dfa.F:
-                lastAcceptedIndex = index
+    # split many (typically short) inputs into tokens at once. the result stores the tokens of all the inputs in
+    # shared flat arrays, see Batch. this is the scan loop of lex, run over every input without any per-input
+    # call, lookup of the table attributes or allocation of a result list. a lexer with a profile scans every input
+    # with scan instead, so the scans are counted, see profiled_scan
+    def lex_many(self, words: Iterable[str]) -> Batch:
+        batch = Batch([], [name for name, _ in self.spec], array('i'), array('i'), array('q'), array('q'), {})
+
+        sources = batch.sources
+        errors = batch.errors
+
+        if (self.linear or self.lazy is not None or self.simulator is not None or self.compiled is not None
+                or self.profile is not None):
+            for number, word in enumerate(words):
+                sources.append(word)
+                count = len(batch.tokens)
+
+                _, error = self.scan(word, 0, batch.tokens, batch.starts, batch.ends)
+                if error != -1:
+                    errors[number] = self.error(word, error)[0][1]
+
+                batch.inputs.extend(array('i', [number]) * (len(batch.tokens) - count))
+
+            return batch
+
+        columns = self.table.columns
+        other = self.table.other if self.table.other != -1 else None
+        width = self.table.width
+        d = self.table.d
+        accepting = self.table.accepting
+        dead = self.table.dead
+        q0 = self.table.q0
+
+        addInput = batch.inputs.append
+        addToken = batch.tokens.append
+        addStart = batch.starts.append
+        addEnd = batch.ends.append
+        addSource = sources.append
+
+        for number, word in enumerate(words):
+            addSource(word)
+
+            length = len(word)
+            index = 0
+
+            while index < length:
+                state = q0
                 lastAcceptedToken = -1
+                lastAcceptedIndex = -1
 
-                # get the first token from the spec
-                for s in state:
-                    if "_f" in s and (lastAcceptedToken == -1 or lastAcceptedToken > int(s[0])):
-                        lastAcceptedToken = int(s[0])
-            
-            index += 1
-        
-        # lexer consumed the whole word without reaching any final or sink states -> lexer error
-        if lastAcceptedIndex == -1:
-            return [("", f"No viable alternative at character EOF, line {line}")]
+                i = index
+                while i < length:
+                    column = columns.get(word[i], other)
+                    if column is None:
+                        break
+
+                    state = d[state * width + column]
+
+                    if dead[state]:
+                        break
+
+                    if accepting[state] != -1:
+                        lastAcceptedIndex = i
+                        lastAcceptedToken = accepting[state]
+
+                    i += 1
+
+                if lastAcceptedIndex == -1:
+                    errors[number] = self.error(word, i)[0][1]
+                    break
+
+                addInput(number)
+                addToken(lastAcceptedToken)
+                addStart(index)
+                addEnd(lastAcceptedIndex + 1)
+
+                index = lastAcceptedIndex + 1
+
+        return batch
+
+    # split a large text into tokens using several processes; the result is the same as lex(text).
+    # the text is cut into chunks of about chunk_size characters, right after a newline when possible, and every
+    # chunk is scanned in a worker process as if a token started at its beginning. tokens only depend on the text
+    # after their start, so once the tokens found so far end exactly where one of the tokens of a chunk starts,
+    # the rest of that chunk's tokens are correct. until then, the text is lexed again in this process. with a
+    # profile, the workers return the reach of every token, and the scan of a chunk is counted from its first token
+    # which is kept, so the profile counts the same tokens as lex(text)
+    def lex_parallel(self, text: str, workers: int | None = None,
+                     chunk_size: int | None = None) -> list[tuple[str, str]] | None:
+        workers = workers or os.cpu_count() or 1
+
+        if chunk_size is None:
+            chunk_size = max(len(text) // (4 * workers), 1 << 16)
+
+        if isinstance(text, memoryview):
+            # a memoryview cannot be searched for newlines
+            text = bytes(text)
+
+        bounds = [0]
+        while bounds[-1] + chunk_size < len(text):
+            newline = text.find(b'\n' if self.binary else '\n', bounds[-1] + chunk_size, bounds[-1] + 2 * chunk_size)
+            bounds.append(newline + 1 if newline != -1 else bounds[-1] + chunk_size)
+
+        if len(bounds) == 1:
+            return self.lex(text)
+
+        # the workers only need the transition table, the nfa simulator, or a lazy dfa with an empty cache of their
+        # own; their profile only tells them to record the reaches
+        lexer = copy.copy(self)
+        lexer.dfa = None
+        lexer.fragments = Fragments()
+        lexer.parts = None
+        lexer.profile = Profile() if self.profile is not None else None
+
+        if self.lazy is not None:
+            lexer.lazy = dataclasses.replace(self.lazy, states={}, used=0)
+
+        # a function compiled from the transition table cannot be sent to the workers, they compile it again
+        recompile = self.compiled is not None and self.table is not None
+        if recompile:
+            lexer.compiled = None
+
+        tokens, starts, ends = array('i'), array('q'), array('q')
+        index = 0
+
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(lexer, recompile)) as pool:
+            chunks = pool.map(scan_chunk, (text[start:end] for start, end in zip(bounds, bounds[1:] + [len(text)])))
+
+            for start, end, chunk in zip(bounds, bounds[1:] + [len(text)], chunks):
+                chunkTokens, chunkStarts, chunkEnds, stop, error, chunkReaches, seconds = chunk
+
+                # lex until reaching the start of one of the tokens of the chunk, or the start of its unfinished
+                # token; the tokens of the chunk before that position are skipped
+                while index < end:
+                    k = bisect_left(chunkStarts, index - start)
+
+                    if k < len(chunkStarts):
+                        boundary = start + chunkStarts[k]
+                    elif start + stop >= index:
+                        boundary = start + stop
+                    else:
+                        boundary = end
+
+                    if index == boundary:
+                        break
+
+                    index, scanError = self.scan(text, index, tokens, starts, ends, True, boundary)
+                    if scanError != -1:
+                        return self.error(text, scanError)
+
+                if index >= end:
+                    continue
+
+                tokens.extend(chunkTokens[k:])
+                starts.extend(chunkStart + start for chunkStart in chunkStarts[k:])
+                ends.extend(chunkEnd + start for chunkEnd in chunkEnds[k:])
+
+                if chunkReaches is not None:
+                    self.profile.count([name for name, _ in self.spec], end - start,
+                                       chunkStarts[k] if k < len(chunkStarts) else stop, stop, error, chunkTokens,
+                                       chunkStarts, chunkEnds, chunkReaches[k:], k, seconds)
+
+                # tokens are synchronized, so an error in the chunk is an error of the whole text
+                if error != -1:
+                    return self.error(text, start + error)
+
+                index = start + stop
+
+        _, error = self.scan(text, index, tokens, starts, ends)
+        if error != -1:
+            return self.error(text, error)
+
+        return [(self.spec[token][0], text[start:end]) for token, start, end in zip(tokens, starts, ends)]
+
+    # lex text read in chunks from a file object (anything with a read method) or from an iterable of strings,
+    # yielding the tokens as soon as they are recognised. only the text of the token being recognised is kept in
+    # memory, so the input may be much larger than the memory. if no token matches, the error is the last tuple
+    def lex_stream(self, readable: Iterable[str], chunk_size: int = 65536) -> Iterator[tuple[str, str]]:
+        if hasattr(readable, 'read'):
+            chunks = iter(lambda: readable.read(chunk_size), b'' if self.binary else '')
+        else:
+            chunks = iter(readable)
+
+        stream = StreamLexer(self, b'' if self.binary else '')
+
+        for chunk in chunks:
+            yield from stream.feed(chunk)
+
+            if stream.failed:
+                return
+
+        yield from stream.finish()
+
+    # lex text received asynchronously, from an asyncio.StreamReader (or anything with a read coroutine) or from an
+    # async iterable of chunks, yielding the tokens as soon as they are recognised, like lex_stream. a text lexer
+    # decodes the bytes it receives as utf-8. the chunks are split into slices of at most slice_size characters,
+    # and control is given back to the event loop after every slice, so the loop is never blocked for longer than
+    # the scan of a slice. if an executor is given, the slices are scanned in it instead, and the loop only waits
+    # for them; the slices of a stream are scanned one after the other, and the state of the stream is shared with
+    # the executor, so it must be a thread pool. the scan of a token longer than a slice is resumed with every slice
+    # from the state it reached (see StreamLexer), so every slice costs the same whatever the length of the tokens
+    async def lex_async(self, readable: asyncio.StreamReader | AsyncIterable[str | bytes], chunk_size: int = 65536,
+                        slice_size: int = 4096, executor: Executor | None = None) -> AsyncIterator[tuple[str, str]]:
+        if hasattr(readable, 'read'):
+            async def read() -> AsyncIterator[bytes]:
+                while chunk := await readable.read(chunk_size):
+                    yield chunk
+
+            chunks = read()
+        else:
+            chunks = aiter(readable)
+
+        stream = StreamLexer(self, b'' if self.binary else '')
+        decoder = None if self.binary else codecs.getincrementaldecoder('utf-8')()
+        loop = asyncio.get_running_loop()
+
+        async for chunk in chunks:
+            if decoder is not None and not isinstance(chunk, str):
+                chunk = decoder.decode(chunk)
+
+            for start in range(0, len(chunk), slice_size):
+                if executor is None:
+                    tokens = stream.feed(chunk[start : start + slice_size])
+                    await asyncio.sleep(0)
+                else:
+                    tokens = await loop.run_in_executor(executor, stream.feed, chunk[start : start + slice_size])
+
+                for token in tokens:
+                    yield token
+
+                if stream.failed:
+                    return
+
+        if decoder is not None:
+            for token in stream.feed(decoder.decode(b'', True)):
+                yield token
+
+            if stream.failed:
+                return
+
+        for token in stream.finish():
+            yield token
+
+# the lexer used by the worker processes of lex_parallel
+worker: Lexer | None = None
+
+def init_worker(lexer: Lexer, compile: bool = False) -> None:
+    global worker
+    worker = lexer
+
+    if compile:
+        worker.compile()
+
+# scan a chunk of the text, assuming a token starts at its beginning; see lex_parallel. if the lexer has a profile,
+# the reaches of the tokens and the seconds of the scan are returned too, for the profile of the parent lexer
+def scan_chunk(chunk: str) -> tuple[array, array, array, int, int, array | None, float]:
+    tokens, starts, ends = array('i'), array('q'), array('q')
+
+    if worker.profile is None:
+        index, error = worker.scan(chunk, 0, tokens, starts, ends, False)
+        return tokens, starts, ends, index, error, None, 0.0
 
-        result.append((self.spec[lastAcceptedToken][0], word[lastStartIndex : lastAcceptedIndex+1]))
+    reaches = array('q')
+    start = time.perf_counter()
+    index, error = worker.scan(chunk, 0, tokens, starts, ends, False, None, reaches)
 
-        return result
+    return tokens, starts, ends, index, error, reaches, time.perf_counter() - start
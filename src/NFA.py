@@ -1,4 +1,5 @@
 from .DFA import DFA
+from .BitNFA import BitNFA
 
 from dataclasses import dataclass
 from collections.abc import Callable
@@ -13,13 +14,29 @@ class NFA[STATE]:
     d: dict[tuple[STATE, str], set[STATE]]
     F: set[STATE]
 
+    def add_state(self) -> int:
+        # add a new state to an nfa whose states are the integers 0 .. len(K) - 1
+        state = len(self.K)
+        self.K.add(state)
+
+        return state
+
+    def add_transition(self, state: STATE, c: str, target: STATE) -> None:
+        if (state, c) in self.d:
+            self.d[(state, c)].add(target)
+        else:
+            self.d[(state, c)] = {target}
+
+        if c != EPSILON:
+            self.S.add(c)
+
     def epsilon_closure(self, state: STATE) -> set[STATE]:
         # the epsilon closure of a state q is a set of states which are reachable from state q on epsilon-transitions
         states = set()
         queue = [state]
         
         while len(queue) > 0:
-            state = queue.pop(0)
+            state = queue.pop()
             if state in states:
                 continue
 
@@ -33,56 +50,142 @@ class NFA[STATE]:
     def find_dfa_final_states(self, dfa_K: set[frozenset[STATE]]) -> set[frozenset[STATE]]:
         return {Q for Q in dfa_K for q in Q if q in self.F}
 
-    def subset_construction(self) -> DFA[frozenset[STATE]]:
-        # convert this nfa to a dfa using the subset construction algorithm
-        dfa_q0 = frozenset(self.epsilon_closure(self.q0))
-        dfa_K = set()
-        dfa_d = {}
+    def epsilon_closures(self, states: list[STATE]) -> list[int]:
+        # compute the epsilon closure of every state at once, as a bitset where bit i stands for states[i].
+        # the strongly connected components of the epsilon transitions are found with Tarjan's algorithm, which
+        # completes a component only after all the components reachable from it: the closure of a component is
+        # then its own states plus the (already known) closures of the components it leads to
+        number = {state: i for i, state in enumerate(states)}
+        epsilon = [[number[s] for s in self.d.get((state, EPSILON), ())] for state in states]
+
+        closures = [0] * len(states)
+        index = [-1] * len(states)
+        low = [0] * len(states)
+        onStack = [False] * len(states)
+        stack = []
+        counter = 0
+
+        for root in range(len(states)):
+            if index[root] != -1:
+                continue
 
-        queue = [dfa_q0]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            onStack[root] = True
 
-        # add a sink state only if neccessary
-        sink_needed = False
-        sink_state = frozenset(set())
+            work = [(root, iter(epsilon[root]))]
 
-        while len(queue) > 0:
-            Q = queue.pop(0)
+            while len(work) > 0:
+                v, successors = work[-1]
+
+                for w in successors:
+                    if index[w] == -1:
+                        # visit w before continuing with the other successors of v
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        onStack[w] = True
+
+                        work.append((w, iter(epsilon[w])))
+                        break
 
-            # do not add duplicate states in K
-            if frozenset(Q) in dfa_K:
+                    if onStack[w]:
+                        low[v] = min(low[v], index[w])
+                else:
+                    work.pop()
+
+                    if len(work) > 0:
+                        u = work[-1][0]
+                        low[u] = min(low[u], low[v])
+
+                    if low[v] != index[v]:
+                        continue
+
+                    # v is the root of a component: pop it from the stack and compute its closure
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        onStack[w] = False
+                        component.append(w)
+
+                        if w == v:
+                            break
+
+                    mask = 0
+                    for w in component:
+                        mask |= 1 << w
+
+                    closure = mask
+                    for w in component:
+                        for s in epsilon[w]:
+                            if not mask & (1 << s):
+                                closure |= closures[s]
+
+                    for w in component:
+                        closures[w] = closure
+
+        return closures
+
+    def to_bits(self) -> BitNFA[STATE]:
+        # convert this nfa to an equivalent one over bitsets of states, with the epsilon transitions folded into
+        # the character transitions: a move on a character directly leads to the closure of its targets
+        states = list(self.K | {self.q0})
+        number = {state: i for i, state in enumerate(states)}
+        closures = self.epsilon_closures(states)
+
+        moves = [{} for _ in states]
+        for (state, c), targets in self.d.items():
+            if c == EPSILON or c not in self.S:
                 continue
 
-            dfa_K.add(Q)
+            mask = 0
+            for target in targets:
+                mask |= closures[number[target]]
 
-            for c in self.S:
-                newStates = set()
+            moves[number[state]][c] = moves[number[state]].get(c, 0) | mask
 
-                for q in Q:
-                    if (q, c) in self.d:
-                        states = self.d.get((q, c))
+        F = 0
+        for state in self.F:
+            if state in number:
+                F |= 1 << number[state]
 
-                        for s in states:
-                            newStates.update(self.epsilon_closure(s))
+        return BitNFA(states, closures[number[self.q0]], moves, F)
 
-                if newStates != set():
-                    dfa_state = frozenset(newStates)
+    def subset_construction(self) -> DFA[frozenset[STATE]]:
+        # convert this nfa to a dfa using the subset construction algorithm.
+        # sets of nfa states are handled as bitsets, using epsilon closures computed once per state; they are
+        # only converted back to frozensets of states when building the resulting dfa
+        bits = self.to_bits()
 
-                    queue.append(dfa_state)
-                    dfa_d[(Q, c)] = dfa_state
-                else:
-                    if not sink_needed:
-                        sink_needed = True
+        # subsets[i] is the bitset of the i-th dfa state, ids is the reverse mapping
+        subsets = [bits.q0]
+        ids = {bits.q0: 0}
+        transitions = []
+
+        # the empty set is the sink state; it is only added if neccessary
+        for Q in subsets:
+            nexts = bits.step(Q)
+            row = {}
+
+            for c in self.S:
+                target = nexts.get(c, 0)
+
+                if target not in ids:
+                    ids[target] = len(subsets)
+                    subsets.append(target)
+
+                row[c] = ids[target]
 
-                        dfa_K.add(sink_state)
+            transitions.append(row)
 
-                        for ch in self.S:
-                            dfa_d[(sink_state, ch)] = sink_state
-                    
-                    dfa_d[(Q, c)] = sink_state
+        dfa_states = [bits.members(Q) for Q in subsets]
 
-        dfa_F = self.find_dfa_final_states(dfa_K)
+        dfa_K = set(dfa_states)
+        dfa_d = {(dfa_states[i], c): dfa_states[j] for i, row in enumerate(transitions) for c, j in row.items()}
+        dfa_F = {dfa_states[i] for i, Q in enumerate(subsets) if Q & bits.F}
 
-        return DFA(self.S, dfa_K, dfa_q0, dfa_d, dfa_F)
+        return DFA(self.S, dfa_K, dfa_states[0], dfa_d, dfa_F)
 
     def remap_states[OTHER_STATE](self, f: 'Callable[[STATE], OTHER_STATE]') -> 'NFA[OTHER_STATE]':
         # works similarly to 'remap_states' from the DFA class. See the comments there for more details.
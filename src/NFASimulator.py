@@ -0,0 +1,236 @@
+from .BitNFA import BitNFA
+from array import array
+from dataclasses import dataclass, field
+
+# the states of the nfa are grouped in chunks of this many bits; the move of a set of states on a character is
+# the union of the moves of its chunks, each found with a single lookup once computed
+CHUNK_BITS = 8
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+@dataclass
+class NFASimulator:
+    # simulates the nfa of the spec directly, like the Pike VM of RE2: the set of active nfa states is an integer
+    # bitset, and each character moves the whole set at once. nothing is determinized, so the build only costs
+    # the nfa, and lexing takes O(m) work per character for an nfa with m states, even for specs whose dfa has
+    # exponentially many states. the move of a set of states on a character is computed a chunk of CHUNK_BITS
+    # states at a time: the move of every (character, chunk, bits of the chunk) is computed the first time it is
+    # needed and kept, so lexing usually does one lookup per chunk of active states
+    nfa: BitNFA
+
+    # maps every character of the alphabet to the representative of its class, the characters of the nfa
+    representatives: dict[str, str]
+
+    # the representative of the characters which are not in representatives, if a negated class matches them
+    other: str | None
+
+    # finals[token] is the bitset of the final nfa states of the token with this index in the spec
+    finals: list[int]
+
+    # the bitset of the nfa states from which a final state can be reached
+    live: int
+
+    # sources[c] is the bitset of the live states with a transition on the representative c
+    sources: dict[str, int] = field(default_factory=dict)
+
+    # chunks[c][offset << CHUNK_BITS | bits] is the move on c of the states offset, offset + 1, ... whose bits are
+    # set in bits, for an offset multiple of CHUNK_BITS
+    chunks: dict[str, dict[int, int]] = field(default_factory=dict)
+
+    # firsts[c] is the move of the initial set of states on the representative c. every token starts from the
+    # initial set, which holds the first state of every rule, so its moves are computed once
+    firsts: dict[str, int] = field(default_factory=dict)
+
+    # maps a set of final states to the index of the first token among them, see token
+    tokens: dict[int, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for i, moves in enumerate(self.nfa.moves):
+            if self.live >> i & 1:
+                for c in moves:
+                    self.sources[c] = self.sources.get(c, 0) | 1 << i
+
+        self.chunks = {c: {} for c in self.sources}
+        self.firsts = {c: self.move(self.nfa.q0, c) for c in self.sources}
+
+    def chunk_move(self, c: str, key: int) -> int:
+        # the move on c of the states of a chunk, from their moves in the nfa
+        moves = self.nfa.moves
+        offset = key >> CHUNK_BITS
+        bits = key & CHUNK_MASK
+
+        target = 0
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            target |= moves[offset + low.bit_length() - 1].get(c, 0)
+
+        self.chunks[c][key] = target
+
+        return target
+
+    def move(self, mask: int, c: str) -> int:
+        # the set of live states reached from the set 'mask' on the representative c
+        mask &= self.sources.get(c, 0)
+        chunks = self.chunks.get(c)
+
+        target = 0
+        while mask:
+            # the chunk of the lowest active state, and the active states in it
+            offset = (mask & -mask).bit_length() - 1
+            offset -= offset % CHUNK_BITS
+            bits = (mask >> offset) & CHUNK_MASK
+            mask ^= bits << offset
+
+            key = offset << CHUNK_BITS | bits
+            moved = chunks.get(key)
+            target |= moved if moved is not None else self.chunk_move(c, key)
+
+        return target & self.live
+
+    def token(self, mask: int) -> int:
+        # the first token of the spec among the final states of the set; a spec with many rules has few different
+        # sets of final states reached together, so the token of each set is only searched once
+        token = self.tokens.get(mask)
+        if token is None:
+            token = next((index for index, final in enumerate(self.finals) if final & mask), -1)
+            self.tokens[mask] = token
+
+        return token
+
+    def resume(self, word: str, i: int, mask: int) -> tuple[int, int | None, int, int]:
+        # same as Lexer.resume, moving the set of active nfa states
+        representatives = self.representatives
+        other = self.other
+        accepting = 0
+        for final in self.finals:
+            accepting |= final
+
+        lastAcceptedToken = -1
+        lastAcceptedIndex = -1
+
+        length = len(word)
+        while i < length:
+            c = representatives.get(word[i], other)
+            if c is None:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            mask = self.move(mask, c)
+
+            if mask == 0:
+                return i, None, lastAcceptedIndex, lastAcceptedToken
+
+            if mask & accepting:
+                lastAcceptedIndex = i
+                lastAcceptedToken = self.token(mask & accepting)
+
+            i += 1
+
+        return i, mask, lastAcceptedIndex, lastAcceptedToken
+
+    def scan(self, word: str, index: int, tokens: array, starts: array, ends: array,
+             final: bool = True, until: int | None = None, linear: bool = False,
+             reaches: array | None = None) -> tuple[int, int]:
+        # same as Lexer.scan, moving the set of active nfa states instead of a dfa state. if linear is set, the
+        # states which failed to reach a final state after the end of a token are remembered, like Lexer.scan_linear
+        # does for dfa states: state q at position p is dropped from the set of a later token, so every pair is
+        # scanned at most twice and the whole scan takes O(n * m) work. the reach of a token then includes the
+        # characters read by the dropped states when they were scanned
+        representatives = self.representatives
+        other = self.other
+        firsts = self.firsts
+        sources = self.sources
+        chunks = self.chunks
+        live = self.live
+        accepting = 0
+        for mask in self.finals:
+            accepting |= mask
+
+        length = len(word)
+        until = length if until is None else min(until, length)
+
+        # maps a position to the bitset of the states known to fail from it, and to the last character read by the
+        # scans which found them
+        failed = {}
+        stops = {}
+
+        while index < until:
+            mask = 0
+            lastAcceptedToken = -1
+            lastAcceptedIndex = -1
+            reach = -1
+
+            # the sets of states reached while scanning this token, at positions index + 1, index + 2, ...
+            trail = []
+
+            i = index
+            while i < length:
+                c = representatives.get(word[i], other)
+                if c is None:
+                    break
+
+                if i == index:
+                    mask = firsts.get(c, 0)
+                else:
+                    # the same as self.move(mask, c)
+                    mask &= sources.get(c, 0)
+                    moves = chunks.get(c)
+
+                    target = 0
+                    while mask:
+                        offset = (mask & -mask).bit_length() - 1
+                        offset -= offset % CHUNK_BITS
+                        bits = (mask >> offset) & CHUNK_MASK
+                        mask ^= bits << offset
+
+                        key = offset << CHUNK_BITS | bits
+                        moved = moves.get(key)
+                        target |= moved if moved is not None else self.chunk_move(c, key)
+
+                    mask = target & live
+
+                if linear:
+                    dropped = failed.get(i + 1, 0)
+                    if mask & dropped:
+                        mask &= ~dropped
+                        reach = max(reach, stops[i + 1])
+
+                if mask == 0:
+                    break
+
+                if mask & accepting:
+                    lastAcceptedIndex = i
+                    lastAcceptedToken = self.token(mask & accepting)
+
+                i += 1
+
+                if linear:
+                    trail.append(mask)
+            else:
+                if not final:
+                    return index, -1
+
+            if lastAcceptedIndex == -1:
+                if linear:
+                    # the states dropped from the set may have gone further than the others before failing: scan
+                    # the token again with all its states, to report the error where the set really became empty
+                    return self.scan(word, index, tokens, starts, ends, final, index + 1)
+
+                return index, i
+
+            reach = max(reach, i)
+
+            # the states reached after the longest match did not lead to a final state
+            for position in range(lastAcceptedIndex + 2, index + len(trail) + 1):
+                failed[position] = failed.get(position, 0) | trail[position - index - 1]
+                stops[position] = max(stops.get(position, -1), reach)
+
+            tokens.append(lastAcceptedToken)
+            starts.append(index)
+            ends.append(lastAcceptedIndex + 1)
+
+            if reaches is not None:
+                reaches.append(reach)
+
+            index = lastAcceptedIndex + 1
+
+        return index, -1
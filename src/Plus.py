@@ -3,23 +3,40 @@ from .NFA import EPSILON
 from .Regex import Regex
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Plus(Regex):
     exp: Regex
 
-    def thompson(self) -> NFA[int]:
-        # convert the regex to an NFA
-        nfa = self.exp.thompson()
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add the nfa of the regex
+        start, final = self.exp.build(nfa)
 
-        q0 = 0
+        # add an epsilon transition to repeat the regex
+        nfa.add_transition(final, EPSILON, start)
 
-        finalState = len(nfa.K) - 1
-  
-        # add epsilon transition
-        d = nfa.d
-    
-        finalStateSet = set() if (finalState, EPSILON) not in nfa.d else nfa.d[(finalState, EPSILON)]
+        return start, final
 
-        d[(finalState, EPSILON)] = finalStateSet | {q0}
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        nullable, first, last = self.exp.positions(chars, follow)
 
-        return NFA(nfa.S, nfa.K, q0, d, {finalState})
+        # the regex can be repeated: its first positions can follow its last positions
+        for p in last:
+            follow[p] |= first
+
+        return nullable, first, last
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return self.exp.character_sets()
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return Regex.make_plus(self.exp.simplify(nodes))
+
+    def utf8(self) -> Regex:
+        return Plus(self.exp.utf8())
+
+    def nullable(self) -> bool:
+        return self.exp.nullable()
+
+    def derivative(self, c: str) -> Regex:
+        # d(r+) = d(r)r*
+        return Regex.make_concat(self.exp.derivative(c), Regex.make_star(self.exp))
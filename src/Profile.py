@@ -0,0 +1,101 @@
+from array import array
+from dataclasses import dataclass, field
+
+import time
+
+@dataclass
+class Profile:
+    # what a lexer built with profile=True measures: the time of every phase of its build and the size of its
+    # automata, and counters of the scans of its lex calls, see Lexer.profiled_scan. a lexer without a profile
+    # measures nothing: its scans do not go through profiled_scan
+
+    # the seconds spent in every phase of the build, in the order of the phases: parse, nfa (building the nfas of
+    # the rules, or taking them from the fragments), merge (copying them into the nfa of the spec), subset
+    # construction, minimize, compile (the transition table), bits (the nfa over bitsets of the lazy dfa and the
+    # nfa simulation), brzozowski, cache. the phases of add_rule and remove_rule are added to those of the build:
+    # parse, nfa, subset construction (the product or the projection of the old dfa), compile and cache
+    phases: dict[str, float] = field(default_factory=dict)
+
+    # the number of states and transitions of the automata built: nfa_states, nfa_transitions, dfa_states,
+    # dfa_transitions, minimized_states, table_states and table_columns
+    sizes: dict[str, int] = field(default_factory=dict)
+
+    # the number of profiled scans, and the seconds they took; a chunk of lex_parallel scanned in a worker counts
+    # as one scan, with the seconds the worker took
+    scans: int = 0
+    seconds: float = 0.0
+
+    # the number of characters split into tokens (bytes for a binary lexer), and the number of characters read
+    # by the scans to find them; every character read after the end of a token is read again by the next token
+    # (rescanned) when the scan backtracks to the longest match. the counts come from the reaches of the tokens: for
+    # a linear lexer, the characters skipped by a scan which meets a state known to fail are counted as read
+    input: int = 0
+    characters: int = 0
+    rescans: int = 0
+
+    # the number of tokens found for every rule, by name, and the number of scans which failed to match a token
+    tokens: dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    # when the last phase ended, see lap
+    clock: float = field(default_factory=time.perf_counter)
+
+    def lap(self, phase: str) -> None:
+        # the phase ended now: add the time since the end of the previous one
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.clock
+        self.clock = now
+
+    def start(self) -> None:
+        # a phase starts now: the time since the end of the previous one is not part of any phase
+        self.clock = time.perf_counter()
+
+    def count(self, names: list[str], length: int, index: int, stop: int, error: int, tokens: array,
+              starts: array, ends: array, reaches: array, first: int, seconds: float) -> None:
+        # add a scan of a word of the given length from index, which stopped at stop with the given error and
+        # appended the tokens from first on, and the reaches of these tokens
+        self.scans += 1
+        self.seconds += seconds
+        self.input += (error if error != -1 else stop) - index
+
+        for token, start, end, reach in zip(tokens[first:], starts[first:], ends[first:], reaches):
+            # the reach is the length of the word when the scan read until its end
+            self.token(names[token], start, end, min(reach, length - 1))
+
+        if error != -1:
+            self.errors += 1
+            # the failed token started where the scan stopped
+            self.characters += min(error, length - 1) - stop + 1
+
+    def token(self, name: str, start: int, end: int, reach: int) -> None:
+        # add a token found from start to end (exclusive), reading up to the character at reach
+        self.characters += reach - start + 1
+        self.rescans += max(reach - end + 1, 0)
+        self.tokens[name] = self.tokens.get(name, 0) + 1
+
+    def reset(self) -> None:
+        # forget the counters of the scans, keeping the measures of the build
+        self.scans = 0
+        self.seconds = 0.0
+        self.input = 0
+        self.characters = 0
+        self.rescans = 0
+        self.tokens = {}
+        self.errors = 0
+
+    def report(self) -> dict:
+        # everything measured, as a json serializable dictionary; the time per million characters (megabyte for
+        # a binary lexer) of input is derived from the scans
+        return {
+            'phases': dict(self.phases),
+            'build_seconds': sum(self.phases.values()),
+            'sizes': dict(self.sizes),
+            'scans': self.scans,
+            'seconds': self.seconds,
+            'input': self.input,
+            'characters': self.characters,
+            'rescans': self.rescans,
+            'tokens': dict(self.tokens),
+            'errors': self.errors,
+            'seconds_per_mb': self.seconds / self.input * 1e6 if self.input > 0 else None,
+        }
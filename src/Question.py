@@ -3,22 +3,39 @@ from .NFA import EPSILON
 from .Regex import Regex
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Question(Regex):
     exp: Regex
 
-    def thompson(self) -> NFA[int]:
-        # convert regex to an NFA and shift the states' values by 1 in order to add the initial state 0
-        nfa = self.exp.thompson().remap_states(lambda x: x+1)
-
-        q0 = 0
-        finalState = len(nfa.K)
-        
-        # add initial and final states
-        K = nfa.K | {q0, finalState}
-    
-        # add epsilon transitions
-        d = nfa.d
-        d[(q0, EPSILON)] = {1, finalState}
-    
-        return NFA(nfa.S, K, q0, d, {finalState})
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add a new initial state, the nfa of the regex and a new final state
+        start = nfa.add_state()
+        expStart, expFinal = self.exp.build(nfa)
+        final = nfa.add_state()
+
+        # add epsilon transitions: skip the regex, or match it once
+        nfa.add_transition(start, EPSILON, expStart)
+        nfa.add_transition(start, EPSILON, final)
+        nfa.add_transition(expFinal, EPSILON, final)
+
+        return start, final
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        _, first, last = self.exp.positions(chars, follow)
+
+        return True, first, last
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return self.exp.character_sets()
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return Regex.make_question(self.exp.simplify(nodes))
+
+    def utf8(self) -> Regex:
+        return Question(self.exp.utf8())
+
+    def nullable(self) -> bool:
+        return True
+
+    def derivative(self, c: str) -> Regex:
+        return self.exp.derivative(c)
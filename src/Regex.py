@@ -1,12 +1,277 @@
+from .DFA import DFA
+from .Complement import Complement
+from .RegexError import RegexError
 from .NFA import NFA
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from abc import ABC, abstractmethod
 
-@dataclass
+import string
+
+@dataclass(frozen=True)
 class Regex(ABC):
-    @abstractmethod
     def thompson(self) -> NFA[int]:
-        raise NotImplementedError('the thompson method of the Regex class should never be called')
+        # convert the regex to an nfa using Thompson's construction; the states are numbered from 0
+        nfa = NFA(alphabet([self]), set(), 0, {}, set())
+
+        start, final = self.build(nfa)
+
+        nfa.q0 = start
+        nfa.F = {final}
+
+        return nfa
+
+    @abstractmethod
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add the states and transitions of the Thompson nfa of the regex to the given nfa, using new states;
+        # returns the initial and final states of the regex. building the whole tree into one nfa avoids copying
+        # and renumbering the nfa of every subexpression
+        raise NotImplementedError('the build method of the Regex class should never be called')
+
+    def glushkov(self) -> NFA[int]:
+        # convert the regex to an nfa using Glushkov's construction: an initial state 0, plus one state for each
+        # position (character or character range) of the regex, and no epsilon transitions
+        nfa = NFA(alphabet([self]), set(), 0, {}, set())
+
+        nfa.q0 = nfa.add_state()
+        nfa.F = self.build_glushkov(nfa, nfa.q0)
+
+        return nfa
+
+    def build_glushkov(self, nfa: NFA[int], start: int) -> set[int]:
+        # add the states and transitions of the Glushkov nfa of the regex to the given nfa, using new states for
+        # the positions and the given initial state; returns the final states.
+        # chars[p] is the set of characters matched at position p of the regex, follow[p] is the set of
+        # positions which can come right after p in a word; first and last are the sets of positions which can
+        # start and end a word
+        chars = []
+        follow = []
+        nullable, first, last = self.positions(chars, follow)
+
+        # the positions of negated character classes match the characters of the alphabet of the nfa they contain
+        chars = [[c for c in nfa.S if c in characters] if isinstance(characters, Complement) else characters
+                 for characters in chars]
+
+        states = [nfa.add_state() for _ in chars]
+
+        # entering a position reads one of its characters
+        for p in first:
+            for c in chars[p]:
+                nfa.add_transition(start, c, states[p])
+
+        for p, positions in enumerate(follow):
+            for q in positions:
+                for c in chars[q]:
+                    nfa.add_transition(states[p], c, states[q])
+
+        return {states[p] for p in last} | ({start} if nullable else set())
+
+    @abstractmethod
+    def positions(self, chars: list[frozenset[str] | Complement], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        # number the positions of the regex, appending their characters to chars and their (initially empty)
+        # follow sets to follow, and add the follow pairs created by the regex.
+        # returns whether the regex matches the empty word, and its first and last positions
+        raise NotImplementedError('the positions method of the Regex class should never be called')
+
+    @abstractmethod
+    def character_sets(self) -> list[frozenset[str] | Complement]:
+        # the sets of characters matched by the leaves of the regex
+        raise NotImplementedError('the character_sets method of the Regex class should never be called')
+
+    def simplify(self, nodes: dict['Regex', 'Regex'] | None = None) -> 'Regex':
+        # return an equivalent regex which is usually smaller, and so gives smaller automata: unions are flattened
+        # and deduplicated, their single character alternatives are merged into character classes, and the
+        # identities of the operators are applied, e.g. (a|a|b)* becomes [ab]*, (x*)* becomes x* and (r+)? becomes
+        # r*. the simplified subtrees are hash-consed: nodes maps every subtree to its only instance, so the equal
+        # subtrees of the regexes simplified with the same nodes (e.g. the rules of a spec) are shared
+        if nodes is None:
+            nodes = {}
+
+        result = self.simplify_node(nodes)
+
+        return nodes.setdefault(result, result)
+
+    @abstractmethod
+    def simplify_node(self, nodes: dict['Regex', 'Regex']) -> 'Regex':
+        # simplify the children of the regex, then the regex itself; see simplify
+        raise NotImplementedError('the simplify_node method of the Regex class should never be called')
+
+    @abstractmethod
+    def utf8(self) -> 'Regex':
+        # the regex matching the utf-8 encodings of the words matched by this regex. it is a regex over bytes: the
+        # character chr(b) stands for the byte b, so ascii characters stand for themselves
+        raise NotImplementedError('the utf8 method of the Regex class should never be called')
+
+    @abstractmethod
+    def nullable(self) -> bool:
+        # whether the regex matches the empty word
+        raise NotImplementedError('the nullable method of the Regex class should never be called')
+
+    @abstractmethod
+    def derivative(self, c: str) -> 'Regex':
+        # the Brzozowski derivative of the regex with respect to c: a regex matching the words w such that the
+        # regex matches cw. derivatives are built with the make_* methods below, which keep them normalized
+        raise NotImplementedError('the derivative method of the Regex class should never be called')
+
+    def brzozowski(self) -> DFA[tuple['Regex']]:
+        # convert the regex to a dfa using Brzozowski derivatives, over the characters of the regex
+        return brzozowski([self], alphabet([self]))
+
+    # smart constructors: they simplify the regexes they build, so that the derivatives of a regex are only
+    # finitely many different regexes, and equal regexes are more often represented the same way
+
+    @staticmethod
+    def make_union(left: 'Regex', right: 'Regex') -> 'Regex':
+        return Regex.make_alternatives([left, right])
+
+    @staticmethod
+    def make_alternatives(regexes: list['Regex']) -> 'Regex':
+        # the union of the regexes. unions are flattened, sorted and without duplicates or empty alternatives, and
+        # the alternatives which match a single character are merged into one character class: (a|b)|(∅|a) becomes
+        # [ab]. the alternatives are sorted once, and nested as a balanced tree, so the union of n alternatives is
+        # built in O(n log n) time and has depth O(log n)
+        alternatives = set()
+        leaves = []
+
+        stack = list(regexes)
+
+        while len(stack) > 0:
+            regex = stack.pop()
+
+            if isinstance(regex, Union):
+                stack.extend([regex.left, regex.right])
+            elif isinstance(regex, Character | SyntacticSugar | CharacterSet):
+                leaves.append(regex.character_sets()[0])
+            elif not isinstance(regex, Empty):
+                alternatives.add(regex)
+
+        if len(leaves) > 0:
+            # the characters of the negated classes which are not matched by another leaf are left out
+            characters = frozenset().union(*[leaf for leaf in leaves if not isinstance(leaf, Complement)])
+            excluded = [leaf.characters for leaf in leaves if isinstance(leaf, Complement)]
+
+            if len(excluded) > 0:
+                alternatives.add(Regex.make_leaf(Complement(frozenset.intersection(*excluded) - characters)))
+            else:
+                alternatives.add(Regex.make_leaf(characters))
+
+        if len(alternatives) == 0:
+            return Empty()
+
+        alternatives = sorted(alternatives, key=describe)
+
+        while len(alternatives) > 1:
+            alternatives = [Union(alternatives[i], alternatives[i + 1]) if i + 1 < len(alternatives) else alternatives[i]
+                            for i in range(0, len(alternatives), 2)]
+
+        return alternatives[0]
+
+    @staticmethod
+    def make_concat(left: 'Regex', right: 'Regex') -> 'Regex':
+        # ∅r = r∅ = ∅, εr = rε = r, and concatenations are nested to the right: (ab)c becomes a(bc). the parts of
+        # the left regex are walked without recursion, so a long chain of concatenations can be extended
+        parts = []
+        stack = [left]
+
+        while len(stack) > 0:
+            regex = stack.pop()
+
+            if isinstance(regex, Concat):
+                stack.extend([regex.right, regex.left])
+            else:
+                parts.append(regex)
+
+        if isinstance(right, Empty) or any(isinstance(part, Empty) for part in parts):
+            return Empty()
+
+        result = right
+        for part in reversed(parts):
+            if isinstance(part, Epsilon):
+                continue
+
+            if isinstance(result, Epsilon):
+                result = part
+            else:
+                result = Concat(part, result)
+
+        return result
+
+    @staticmethod
+    def make_star(exp: 'Regex') -> 'Regex':
+        # ∅* = ε* = ε, (r*)* = (r+)* = (r?)* = r*
+        if isinstance(exp, Empty) or isinstance(exp, Epsilon):
+            return Epsilon()
+
+        if isinstance(exp, Star):
+            return exp
+
+        if isinstance(exp, Plus) or isinstance(exp, Question):
+            return Star(exp.exp)
+
+        return Star(exp)
+
+    @staticmethod
+    def make_plus(exp: 'Regex') -> 'Regex':
+        # ∅+ = ∅, ε+ = ε, (r+)+ = r+, (r*)+ = (r?)+ = r*
+        if isinstance(exp, Empty) or isinstance(exp, Epsilon) or isinstance(exp, Plus) or isinstance(exp, Star):
+            return exp
+
+        if isinstance(exp, Question):
+            return Star(exp.exp)
+
+        return Plus(exp)
+
+    @staticmethod
+    def make_question(exp: 'Regex') -> 'Regex':
+        # ∅? = ε, (r+)? = r*, and r? = r if r already matches the empty word: ε? = ε, (r*)? = r*, (r?)? = r?
+        if isinstance(exp, Empty):
+            return Epsilon()
+
+        if isinstance(exp, Plus):
+            return Star(exp.exp)
+
+        if exp.nullable():
+            return exp
+
+        return Question(exp)
+
+    @staticmethod
+    def make_utf8(ranges: list[tuple[int, int]]) -> 'Regex':
+        # the regex over bytes matching the utf-8 encodings of the characters with codes in the given ranges
+        alternatives = []
+
+        for start, end in ranges:
+            for sequence in utf8_sequences(start, end):
+                # a sequence of byte ranges, e.g. [\xc3-\xdf][\x80-\xbf]
+                leaves = [Character(chr(low)) if low == high else SyntacticSugar(chr(low), chr(high))
+                          for low, high in sequence]
+
+                exp = leaves.pop()
+                while len(leaves) > 0:
+                    exp = Concat(leaves.pop(), exp)
+
+                alternatives.append(exp)
+
+        return Regex.make_alternatives(alternatives)
+
+    @staticmethod
+    def make_leaf(characters: str | frozenset[str] | Complement) -> 'Regex':
+        # the regex matching one of the given characters, using the simplest leaf
+        if isinstance(characters, Complement):
+            return CharacterSet(characters.characters, True)
+
+        if len(characters) == 0:
+            return Empty()
+
+        if len(characters) == 1:
+            return Character(next(iter(characters)))
+
+        first = min(characters)
+        last = max(characters)
+
+        if ord(last) - ord(first) + 1 == len(characters):
+            return SyntacticSugar(first, last)
+
+        return CharacterSet(frozenset(characters))
 
 from .Character import Character
 from .Concat import Concat
@@ -15,92 +280,367 @@ from .Star import Star
 from .Question import Question
 from .Plus import Plus
 from .SyntacticSugar import SyntacticSugar
+from .CharacterSet import CharacterSet
+from .Empty import Empty
+from .Epsilon import Epsilon
 
-def isValidChar(c: str):
-    return c.isalnum() or (c in ['_', '.', '-', '@', ':'])
+def describe(regex: Regex) -> str:
+    # the repr of the regex, built without recursion, so that a deep regex (e.g. a long literal) can be described;
+    # the alternatives of a union are sorted by it, see Regex.make_alternatives
+    parts = []
+    stack = [regex]
 
-def parse_regex(regex: str) -> Regex:
-    # create a Regex object by parsing the string
-    stack = []
-    queue = []
+    while len(stack) > 0:
+        item = stack.pop()
 
-    lastChr = ''
+        if isinstance(item, str):
+            parts.append(item)
+        else:
+            # the fields of the regex are described in order, between its name and the closing parenthesis
+            stack.append(')')
+            for i, value in reversed(list(enumerate(getattr(item, f.name) for f in fields(item)))):
+                stack.append(value if isinstance(value, Regex) else repr(value))
+                if i > 0:
+                    stack.append(', ')
+            stack.append(f'{type(item).__name__}(')
 
-    priority = {'*': 5, '.': 4, '|': 3, '(': 0}
-    escapeCharacters = [' ', '*', '+', ')', '(', '|', '?', '/']
-    validConcatenationChars = [')', '*', '+', '?', ']', '\\']
+    return ''.join(parts)
 
-    i = 0
-    length = len(regex)
+def alphabet_classes(regexes: list[Regex]) -> list[frozenset[str] | Complement]:
+    # split the alphabet of the given regexes into classes of characters which are matched by exactly the same
+    # leaves: an automaton built from these regexes has the same transitions on all the characters of a class,
+    # so it only needs one column per class. e.g. for 'if' and '[a-z]+' the classes are {i}, {f} and the 24
+    # other lowercase letters. if a leaf is a negated character class, the characters which do not appear in
+    # any leaf are matched by the negated classes only, and make up one more class, the last of the list
+    sets = [characters for regex in regexes for characters in regex.character_sets()]
+    complements = [index for index, characters in enumerate(sets) if isinstance(characters, Complement)]
 
-    while i < length:
-        c = regex[i]
+    # the indices of the leaves matching each character which appears in a leaf
+    leaves = {}
+    for index, characters in enumerate(sets):
+        if isinstance(characters, Complement):
+            for c in characters.characters:
+                leaves.setdefault(c, [])
+        else:
+            for c in characters:
+                leaves.setdefault(c, []).append(index)
+
+    classes = {}
+    for c, indices in leaves.items():
+        indices = sorted(indices + [index for index in complements if c in sets[index]])
+        classes.setdefault(tuple(indices), set()).add(c)
+
+    result = sorted((frozenset(characters) for characters in classes.values()), key=min)
+
+    if len(complements) > 0:
+        result.append(Complement(frozenset(leaves)))
+
+    return result
+
+def alphabet(regexes: list[Regex]) -> set[str]:
+    # the characters of the regexes, and the representative of the characters matched by their negated classes
+    return {c for characters in alphabet_classes(regexes)
+            for c in ([characters.representative()] if isinstance(characters, Complement) else characters)}
 
-        # check if it's an escaped characted
-        if c == '\n' or (c in escapeCharacters and i > 0 and regex[i-1] == '\\'):        
-            queue.append(Character(c))
+def utf8_sequences(start: int, end: int) -> list[list[tuple[int, int]]]:
+    # split the range of character codes start - end into sequences of byte ranges matching exactly their utf-8
+    # encodings, e.g. 0x80 - 0x7ff is the single sequence [\xc2-\xdf][\x80-\xbf]. the range is split until
+    # all the characters of a part have encodings of the same length, which only differ in the bytes where the
+    # encodings of its first and last characters differ (the algorithm of RE2 and of rust's regex crate).
+    # surrogates have no utf-8 encoding and are left out
+    sequences = []
+    stack = [(start, end)]
 
-            lastChr = '\\'
-            i += 1
+    while len(stack) > 0:
+        start, end = stack.pop()
 
+        if start > end:
             continue
 
-        # ignore whitespace
-        if c == ' ':
-            i += 1
+        if start <= 0xdfff and end >= 0xd800:
+            stack.extend([(0xe000, end), (start, 0xd7ff)])
             continue
-        
-        # check if a concatenation is required
-        if (isValidChar(c) or c in ['(', '[', '\\']) and (isValidChar(lastChr) or lastChr in validConcatenationChars):
-            stack.append('.')
-        
-        if isValidChar(c):
-            queue.append(Character(c))
-
-        elif c == '|':
-            while len(stack) > 0 and priority[stack[-1]] >= priority['|']:
-                op = stack.pop()
-                c2 = queue.pop()
-                c1 = queue.pop()
-
-                queue.append(Concat(c1, c2) if op == '.' else Union(c1, c2))
-
-            stack.append(c)
-
-        elif c == '*':
-            queue.append(Star(queue.pop()))
-            
-        elif c == '?':
-            queue.append(Question(queue.pop()))
 
-        elif c == '+':
-            queue.append(Plus(queue.pop()))
+        # the largest codes encoded with 1, 2 and 3 bytes
+        limit = next((limit for limit in [0x7f, 0x7ff, 0xffff] if start <= limit < end), None)
+        if limit is not None:
+            stack.extend([(limit + 1, end), (start, limit)])
+            continue
+
+        if end <= 0x7f:
+            sequences.append([(start, end)])
+            continue
+
+        # the last i bytes of the encodings must span all the continuation bytes if the bytes before them differ
+        for i in range(1, 4):
+            mask = (1 << (6 * i)) - 1
+
+            if start & ~mask != end & ~mask:
+                if start & mask != 0:
+                    stack.extend([((start | mask) + 1, end), (start, start | mask)])
+                    break
+
+                if end & mask != mask:
+                    stack.extend([(end & ~mask, end), (start, (end & ~mask) - 1)])
+                    break
+        else:
+            sequences.append(list(zip(chr(start).encode(), chr(end).encode())))
+
+    return sequences
+
+def brzozowski(regexes: list[Regex], alphabet: set[str]) -> DFA[tuple[Regex, ...]]:
+    # build a dfa recognising the given regexes directly from their Brzozowski derivatives, without an nfa.
+    # every state is the vector of the derivatives of the regexes with respect to the word read so far, so the
+    # state tells for each regex whether it matched (its derivative is nullable) and whether it still can (its
+    # derivative is not ∅). the derivatives are normalized by the smart constructors, so there are finitely many
+    # of them and equivalent vectors are often the same state: the dfa is usually close to minimal
+    q0 = tuple(regexes)
+    K = {q0}
+    d = {}
+    queue = [q0]
+
+    for state in queue:
+        for c in alphabet:
+            next = tuple(regex.derivative(c) for regex in state)
+
+            if next not in K:
+                K.add(next)
+                queue.append(next)
+
+            d[(state, c)] = next
+
+    F = {state for state in K if any(regex.nullable() for regex in state)}
+
+    return DFA(alphabet, K, q0, d, F)
+
+# characters which cannot start an atom of a regex; any other character (including '.') matches itself
+OPERATORS = frozenset('()|*+?[{\\')
+
+# escapes of characters which are hard to write in a regex
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', '0': '\0'}
 
-        elif c == '(':
-            stack.append(c)
+# escapes of predefined character classes: \d, \w, \s and their negations \D, \W, \S
+CLASSES = {
+    'd': frozenset(string.digits),
+    'w': frozenset(string.ascii_letters + string.digits + '_'),
+    's': frozenset(' \t\n\r\f\v'),
+}
 
-        elif c == ')':
-            op = stack.pop()
-            while op != '(':
-                c2 = queue.pop()
-                c1 = queue.pop()
+def parse_regex(regex: str) -> Regex:
+    # create a Regex object by parsing the string, with a recursive descent parser reading it once from left to
+    # right. from the lowest to the highest priority, the grammar is
+    #   union      := concat ('|' concat)*
+    #   concat     := repetition*
+    #   repetition := atom ('*' | '+' | '?' | '{m}' | '{m,}' | '{m,n}')*
+    #   atom       := '(' union ')' | '[' class ']' | '\' escape | character
+    # unescaped spaces are ignored outside of character classes, and an empty regex, group or alternative matches
+    # the empty word. raises RegexError with the offset of the first character which does not fit the grammar
+    result, i = parse_union(regex, 0)
 
-                queue.append(Concat(c1, c2) if op == '.' else Union(c1, c2))
+    if i < len(regex):
+        # parse_union only stops early on a closing parenthesis
+        raise RegexError('unbalanced )', regex, i)
 
-                op = stack.pop()
-        
-        elif c == '[':
-            queue.append(SyntacticSugar(regex[i+1], regex[i+3]))
-            i += 4
+    return result
 
-        lastChr = regex[i]
+def skip_spaces(regex: str, i: int) -> int:
+    while i < len(regex) and regex[i] == ' ':
         i += 1
 
-    result = queue.pop()
-    while len(stack) > 0:
-        op = stack.pop()
-        c1 = queue.pop()
+    return i
+
+def parse_union(regex: str, i: int) -> tuple[Regex, int]:
+    result, i = parse_concat(regex, i)
+
+    while i < len(regex) and regex[i] == '|':
+        right, i = parse_concat(regex, i + 1)
+        result = Union(result, right)
+
+    return result, i
+
+def parse_concat(regex: str, i: int) -> tuple[Regex, int]:
+    parts = []
+
+    i = skip_spaces(regex, i)
+    while i < len(regex) and regex[i] not in '|)':
+        part, i = parse_repetition(regex, i)
+        parts.append(part)
+
+        i = skip_spaces(regex, i)
+
+    if len(parts) == 0:
+        return Epsilon(), i
+
+    # concatenations are nested to the right: abc is a(bc)
+    result = parts.pop()
+    while len(parts) > 0:
+        result = Concat(parts.pop(), result)
+
+    return result, i
+
+def parse_repetition(regex: str, i: int) -> tuple[Regex, int]:
+    result, i = parse_atom(regex, i)
+
+    i = skip_spaces(regex, i)
+    while i < len(regex) and regex[i] in '*+?{':
+        c = regex[i]
+
+        if c == '*':
+            result = Star(result)
+        elif c == '+':
+            result = Plus(result)
+        elif c == '?':
+            result = Question(result)
+        else:
+            minimum, maximum, end = parse_count(regex, i)
+            result = repeat(result, minimum, maximum)
+            i = end - 1
+
+        i = skip_spaces(regex, i + 1)
+
+    return result, i
 
-        result = Concat(c1, result) if op == '.' else Union(c1, result)
+def parse_count(regex: str, i: int) -> tuple[int, int | None, int]:
+    # parse the counted repetition {m}, {m,} or {m,n} starting at index i; returns m, n (None if unbounded) and
+    # the index after the closing brace
+    end = regex.find('}', i)
+    if end == -1:
+        raise RegexError('unterminated counted repetition', regex, i)
+
+    bounds = regex[i + 1 : end].replace(' ', '').split(',')
+
+    if len(bounds) > 2 or not bounds[0].isdigit() or (len(bounds) == 2 and bounds[1] != '' and not bounds[1].isdigit()):
+        raise RegexError('invalid counted repetition', regex, i)
+
+    minimum = int(bounds[0])
+    if len(bounds) == 1:
+        maximum = minimum
+    else:
+        maximum = int(bounds[1]) if bounds[1] != '' else None
+
+    if maximum is not None and maximum < minimum:
+        raise RegexError('invalid counted repetition', regex, i)
+
+    return minimum, maximum, end + 1
+
+def repeat(exp: Regex, minimum: int, maximum: int | None) -> Regex:
+    # exp{m,n} is m copies of exp followed by n - m nested optional copies, so it grows linearly with n:
+    # a{2,4} is aa(a(a)?)?, and a{2,} is aaa*
+    if maximum is None:
+        result = Star(exp)
+    else:
+        result = Epsilon()
+        for _ in range(maximum - minimum):
+            result = Question(Regex.make_concat(exp, result))
+
+    for _ in range(minimum):
+        result = Regex.make_concat(exp, result)
 
     return result
+
+def parse_atom(regex: str, i: int) -> tuple[Regex, int]:
+    c = regex[i]
+
+    if c == '(':
+        result, end = parse_union(regex, i + 1)
+
+        if end == len(regex):
+            raise RegexError('missing )', regex, i)
+
+        return result, end + 1
+
+    if c == '[':
+        return parse_class(regex, i)
+
+    if c == '\\':
+        characters, end = parse_escape(regex, i)
+        return Regex.make_leaf(characters), end
+
+    if c in OPERATORS:
+        raise RegexError('nothing to repeat', regex, i)
+
+    return Character(c), i + 1
+
+def parse_escape(regex: str, i: int) -> tuple[str | frozenset[str] | Complement, int]:
+    # parse the escape starting with the backslash at index i; returns the escaped character, or the set of
+    # characters of a predefined class, and the index after the escape
+    if i + 1 == len(regex):
+        raise RegexError('incomplete escape', regex, i)
+
+    c = regex[i + 1]
+
+    if c in ESCAPES:
+        return ESCAPES[c], i + 2
+
+    if c.lower() in CLASSES:
+        return (CLASSES[c] if c.islower() else Complement(CLASSES[c.lower()])), i + 2
+
+    if c in 'xu':
+        # \xhh and \uhhhh: the character with the given hexadecimal code
+        digits = regex[i + 2 : i + (4 if c == 'x' else 6)]
+
+        if len(digits) != (2 if c == 'x' else 4) or any(d not in string.hexdigits for d in digits):
+            raise RegexError('invalid character code', regex, i)
+
+        return chr(int(digits, 16)), i + 2 + len(digits)
+
+    if c.isalnum():
+        raise RegexError('unknown escape', regex, i)
+
+    # an escaped operator, space or punctuation character matches itself
+    return c, i + 2
+
+def parse_class(regex: str, i: int) -> tuple[Regex, int]:
+    # parse the character class starting with the bracket at index i: a list of characters and ranges like a-z,
+    # negated by a leading ^. a - at the start or the end of the list is an ordinary character
+    start = i
+    i += 1
+
+    negated = i < len(regex) and regex[i] == '^'
+    if negated:
+        i += 1
+
+    characters = set()
+    ranges = []
+
+    while i < len(regex) and regex[i] != ']':
+        if regex[i] == '\\':
+            first, i = parse_escape(regex, i)
+        else:
+            first, i = regex[i], i + 1
+
+        if not isinstance(first, str):
+            if isinstance(first, Complement):
+                raise RegexError('negated classes cannot be part of a character class', regex, i - 2)
+
+            characters |= first
+            continue
+
+        if i + 1 < len(regex) and regex[i] == '-' and regex[i + 1] != ']':
+            if regex[i + 1] == '\\':
+                last, end = parse_escape(regex, i + 1)
+            else:
+                last, end = regex[i + 1], i + 2
+
+            if not isinstance(last, str) or last < first:
+                raise RegexError('invalid range', regex, i - 1)
+
+            ranges.append((first, last))
+            i = end
+        else:
+            characters.add(first)
+
+    if i == len(regex):
+        raise RegexError('missing ]', regex, start)
+
+    if len(characters) == 0 and len(ranges) == 0:
+        raise RegexError('empty character class', regex, start)
+
+    # a single range keeps its own node, which does not list its characters
+    if not negated and len(characters) == 0 and len(ranges) == 1:
+        return SyntacticSugar(*ranges[0]), i + 1
+
+    for first, last in ranges:
+        characters.update(chr(code) for code in range(ord(first), ord(last) + 1))
+
+    return Regex.make_leaf(Complement(frozenset(characters)) if negated else frozenset(characters)), i + 1
@@ -0,0 +1,7 @@
+class RegexError(ValueError):
+    # raised by parse_regex when the regex is not valid; offset is the index of the character where parsing failed
+    def __init__(self, message: str, regex: str, offset: int) -> None:
+        super().__init__(f'{message} at offset {offset} in regex {regex!r}')
+
+        self.regex = regex
+        self.offset = offset
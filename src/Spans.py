@@ -0,0 +1,31 @@
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+@dataclass
+class Spans:
+    # the tokens found in a text, stored as offsets into the text instead of copies of the lexemes.
+    # token i is the token number tokens[i] of the spec, matching source[starts[i]:ends[i]]
+    source: str
+    names: list[str]
+    tokens: array
+    starts: array
+    ends: array
+
+    # the lexer error message if the text could not be split into tokens; the spans are then the tokens found
+    # before the error
+    error: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        # iterate over the spans as (token index in the spec, start, end) tuples, without copying any text
+        return zip(self.tokens, self.starts, self.ends)
+
+    def __getitem__(self, i: int) -> tuple[str, str]:
+        # materialize token i as (TOKEN_NAME, MATCHED_STRING), like the tokens returned by Lexer.lex
+        return self.names[self.tokens[i]], self.lexeme(i)
+
+    def lexeme(self, i: int) -> str:
+        return self.source[self.starts[i] : self.ends[i]]
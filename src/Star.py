@@ -3,28 +3,45 @@ from .NFA import EPSILON
 from .Regex import Regex
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Star(Regex):
     exp: Regex
 
-    def thompson(self) -> NFA[int]:
-        # convert regex to an NFA and shift the states' values by 1 in order to add the initial state 0
-        nfa = self.exp.thompson().remap_states(lambda x: x+1)
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add a new initial state, the nfa of the regex and a new final state
+        start = nfa.add_state()
+        expStart, expFinal = self.exp.build(nfa)
+        final = nfa.add_state()
 
-        lastState = len(nfa.K)
-        finalState = len(nfa.K) + 1
+        # add epsilon transitions: skip the regex, or repeat it
+        nfa.add_transition(start, EPSILON, expStart)
+        nfa.add_transition(start, EPSILON, final)
+        nfa.add_transition(expFinal, EPSILON, expStart)
+        nfa.add_transition(expFinal, EPSILON, final)
 
-        q0 = 0
+        return start, final
 
-        # add initial state (0) and final state
-        K = nfa.K.union({0, finalState})
-    
-        # add epsilon transitions
-        d = nfa.d
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        _, first, last = self.exp.positions(chars, follow)
 
-        lastStateSet = set() if (lastState, EPSILON) not in d else d[(lastState, EPSILON)]
+        # the regex can be repeated: its first positions can follow its last positions
+        for p in last:
+            follow[p] |= first
 
-        d[(q0, EPSILON)] = {1, finalState}
-        d[(lastState, EPSILON)] = lastStateSet | {1, finalState}
-    
-        return NFA(nfa.S, K, q0, d, {finalState})
+        return True, first, last
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return self.exp.character_sets()
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return Regex.make_star(self.exp.simplify(nodes))
+
+    def utf8(self) -> Regex:
+        return Star(self.exp.utf8())
+
+    def nullable(self) -> bool:
+        return True
+
+    def derivative(self, c: str) -> Regex:
+        # d(r*) = d(r)r*
+        return Regex.make_concat(self.exp.derivative(c), self)
@@ -0,0 +1,128 @@
+from array import array
+from dataclasses import dataclass, field
+
+@dataclass
+class StreamLexer:
+    # splits a text received in chunks into tokens, see Lexer.lex_stream. the scan of a token which is not complete
+    # at the end of a chunk is resumed on the next chunk from the state it reached (see Lexer.resume), so a token
+    # spanning many chunks is read once, and only the text after its longest match is read again
+    lexer: 'Lexer'
+
+    # an empty text, of the type of the input: bytes for a binary lexer
+    empty: str | bytes = ''
+
+    # the text which was received but not split into tokens yet: the start of an unfinished token, in the pieces
+    # it was received in, and its length
+    pieces: list[str | bytes] = field(default_factory=list)
+    length: int = 0
+
+    # the state reached by the scan of the unfinished token at the end of the pieces, or None if there is no
+    # unfinished token, or if the lexer cannot resume a scan (a lexer with only a compiled scan function): the
+    # pieces are then scanned again with the next chunk
+    state: object | None = None
+
+    # the end of the longest match of the unfinished token in the pieces, and its token; -1 if none
+    end: int = -1
+    token: int = -1
+
+    # number of newlines before the pieces, and number of characters between the last of them and the pieces;
+    # only used to report the position of an error
+    line: int = 0
+    column: int = 0
+
+    # set once no token matched, no more tokens are produced after that
+    failed: bool = False
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        # add text to the input and return the tokens which are now complete
+        if self.failed:
+            return []
+
+        if self.state is None:
+            return self.split(self.pending() + text, False)
+
+        i, state, last, token = self.lexer.resume(text, 0, self.state)
+        if last != -1:
+            self.end = self.length + last + 1
+            self.token = token
+
+        if state is not None:
+            # the token may still continue after the text
+            self.pieces.append(text)
+            self.length += len(text)
+            self.state = state
+            return []
+
+        # the token stopped in the text: it is its longest match, and the rest is split again
+        stop = self.length + i
+        end, token = self.end, self.token
+        word = self.pending() + text
+        self.state = None
+
+        if end == -1:
+            self.failed = True
+            return self.lexer.error(word, stop, self.line, self.column)
+
+        result = [(self.lexer.spec[token][0], word[:end])]
+        self.advance(word, end)
+
+        # the scans of the token were resumed, not run by Lexer.scan: count the token in the profile here
+        if self.lexer.profile is not None:
+            self.lexer.profile.input += end
+            self.lexer.profile.token(result[0][0], 0, end, min(stop, len(word) - 1))
+
+        return result + self.split(word[end:], False)
+
+    def finish(self) -> list[tuple[str, str]]:
+        # the input ended: return the remaining tokens
+        return self.split(self.pending(), True)
+
+    def pending(self) -> str | bytes:
+        # the text of the unfinished token, which is then dropped from the stream
+        text = self.empty.join(self.pieces)
+
+        self.pieces = []
+        self.length = 0
+        self.end = -1
+        self.token = -1
+
+        return text
+
+    def advance(self, word: str, index: int) -> None:
+        # the text of word before index was split into tokens: keep track of the position of the rest
+        newline = b'\n' if self.lexer.binary else '\n'
+
+        position = word.rfind(newline, 0, index)
+        if position == -1:
+            self.column += index
+        else:
+            self.line += word.count(newline, 0, index)
+            self.column = index - position - 1
+
+    def split(self, word: str, final: bool) -> list[tuple[str, str]]:
+        if self.failed:
+            return []
+
+        tokens, starts, ends = array('i'), array('q'), array('q')
+        index, error = self.lexer.scan(word, 0, tokens, starts, ends, final)
+
+        result = [(self.lexer.spec[token][0], word[start:end]) for token, start, end in zip(tokens, starts, ends)]
+
+        if error != -1:
+            self.failed = True
+            return result + self.lexer.error(word, error, self.line, self.column)
+
+        self.advance(word, index)
+
+        if index < len(word):
+            # the unfinished token: scan it once more, to resume its scan on the next chunk
+            rest = word[index:]
+            self.pieces = [rest]
+            self.length = len(rest)
+
+            start = self.lexer.start_state()
+            if start is not None:
+                _, self.state, last, self.token = self.lexer.resume(rest, 0, start)
+                self.end = last + 1 if last != -1 else -1
+
+        return result
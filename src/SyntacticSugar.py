@@ -1,17 +1,43 @@
 from .NFA import NFA
 from .Regex import Regex
+from .Character import Character
+from .Empty import Empty
+from .Epsilon import Epsilon
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class SyntacticSugar(Regex):
     start: str
     end: str
 
-    def thompson(self) -> NFA[int]:
-        # the alphabet contains all characters in range start - end
-        S = {chr(i) for i in range(ord(self.start), ord(self.end)+1)}
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # the nfa has a transition from the start state to the final state for each character in range start - end
+        start = nfa.add_state()
+        final = nfa.add_state()
 
-        # nfa will have a transition from initial state 0 to final state 1 for each character in the alphabet
-        d = {(0, c): {1} for c in S}
+        for i in range(ord(self.start), ord(self.end)+1):
+            nfa.add_transition(start, chr(i), final)
 
-        return NFA(S, {0, 1}, 0, d, {1})
+        return start, final
+
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        # a leaf is a single position
+        chars.append(self.character_sets()[0])
+        follow.append(set())
+
+        return False, {len(chars) - 1}, {len(chars) - 1}
+
+    def character_sets(self) -> list[frozenset[str]]:
+        return [frozenset(chr(i) for i in range(ord(self.start), ord(self.end)+1))]
+
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        return Character(self.start) if self.start == self.end else self
+
+    def utf8(self) -> Regex:
+        return self if self.end < '\x80' else Regex.make_utf8([(ord(self.start), ord(self.end))])
+
+    def nullable(self) -> bool:
+        return False
+
+    def derivative(self, c: str) -> Regex:
+        return Epsilon() if self.start <= c <= self.end else Empty()
@@ -0,0 +1,316 @@
+import dataclasses
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+
+# header of the binary format: magic, format version, width, q0, number of states, number of characters and the
+# column of the other characters
+HEADER = struct.Struct('<4sIIIIIi')
+MAGIC = b'LEXT'
+VERSION = 2
+
+@dataclass
+class TransitionTable:
+    # maps every character of the alphabet to its column in the table
+    columns: dict[str, int]
+
+    # number of columns, i.e. the length of a row
+    width: int
+
+    # the initial state; states are dense integers 0 .. len(d) // width - 1
+    q0: int
+
+    # flat transition table: the next state from 'state' on column 'column' is d[state * width + column]
+    d: array
+
+    # accepting[state] is the index of the token recognised in 'state', or -1 if the state is not final
+    accepting: array
+
+    # dead[state] is 1 if no final state can be reached from 'state', so scanning further is pointless
+    dead: array
+
+    # the column of the characters which are not in columns, or -1 if they cannot be part of a token. they are
+    # matched by the negated character classes of the spec, like [^a-z]
+    other: int = -1
+
+    def for_bytes(self) -> 'TransitionTable':
+        # a copy of this table, for a dfa over bytes (whose characters are chr(0) .. chr(255)), with the columns
+        # indexed by the byte values: indexing a bytes-like object gives integers
+        return dataclasses.replace(self, columns={ord(c): column for c, column in self.columns.items()})
+
+    def next(self, state: int, c: str) -> int:
+        # return the next state from 'state' on character c, or -1 if c is not in the alphabet
+        column = self.columns.get(c, self.other)
+
+        if column == -1:
+            return -1
+
+        return self.d[state * self.width + column]
+
+    def to_bytes(self) -> bytes:
+        # serialize the table to a compact binary format: a fixed size header followed by the arrays, stored
+        # back to back in little endian order so that they can be read straight from a memory mapped file.
+        #   header | (character, column) pairs as uint32 | d as int32 | accepting as int32 | dead as int8
+        # the columns of a table for bytes are indexed by integers already
+        codes = {c if isinstance(c, int) else ord(c): column for c, column in self.columns.items()}
+        columns = array('I', [value for code, column in sorted(codes.items()) for value in (code, column)])
+        arrays = [columns, array('i', self.d), array('i', self.accepting)]
+
+        if sys.byteorder == 'big':
+            for values in arrays:
+                values.byteswap()
+
+        header = HEADER.pack(MAGIC, VERSION, self.width, self.q0, len(self.accepting), len(self.columns), self.other)
+
+        return header + b''.join(values.tobytes() for values in arrays) + bytes(self.dead)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'TransitionTable':
+        # load a table written by to_bytes; data may be any buffer, e.g. bytes or an mmap.mmap object.
+        # raises ValueError if the data is not a serialized table of the current format version, or if its states
+        # or columns are out of range, so that a damaged or forged file is never used to scan
+        data = memoryview(data)
+
+        if len(data) < HEADER.size:
+            raise ValueError('truncated transition table')
+
+        magic, version, width, q0, states, characters, other = HEADER.unpack(data[:HEADER.size])
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a transition table of the current format version')
+
+        sizes = [('I', 2 * characters), ('i', states * width), ('i', states)]
+        if len(data) != HEADER.size + 4 * sum(size for _, size in sizes) + states:
+            raise ValueError('truncated transition table')
+
+        arrays = []
+        offset = HEADER.size
+        for typecode, size in sizes:
+            values = array(typecode)
+            values.frombytes(data[offset : offset + 4 * size])
+
+            if sys.byteorder == 'big':
+                values.byteswap()
+
+            arrays.append(values)
+            offset += 4 * size
+
+        pairs, d, accepting = arrays
+
+        if q0 >= states or not -1 <= other < width or max(pairs[1::2], default=-1) >= width:
+            raise ValueError('transition table with a state or a column out of range')
+
+        if min(d, default=0) < 0 or max(d, default=0) >= states or min(accepting, default=-1) < -1:
+            raise ValueError('transition table with a state or a token out of range')
+
+        columns = {chr(pairs[i]): pairs[i + 1] for i in range(0, len(pairs), 2)}
+        dead = array('b', data[offset:])
+
+        return TransitionTable(columns, width, q0, d, accepting, dead, other)
+
+    def to_source(self) -> str:
+        # generate the source of a python function scan(word, index, tokens, starts, ends, final, until), with the
+        # same contract as Lexer.scan, specialized for this table: every live state is a leaf of a balanced tree of
+        # comparisons on the state, so finding the code of a state takes O(log n) comparisons for n states, and the
+        # code of a state tests the character with comparisons instead of looking it up in the table, and sets the
+        # longest match when entering a final state. the transitions of a state back to itself are
+        # a tight loop over the characters, which consumes the bulk of most tokens (identifiers, numbers, spaces)
+        # without going through the chain
+        characters = {}
+        for c, column in self.columns.items():
+            characters.setdefault(column, []).append(c)
+
+        constants = {}
+        lines = []
+
+        def condition(chars: list[str] | list[int]) -> str:
+            # a python expression testing whether the character c is one of chars; the characters of a table for
+            # bytes are integers
+            chars = sorted(chars)
+            code = lambda c: c if isinstance(c, int) else ord(c)
+
+            ranges = []
+            for c in chars:
+                if len(ranges) > 0 and code(c) == code(ranges[-1][1]) + 1:
+                    ranges[-1][1] = c
+                else:
+                    ranges.append([c, c])
+
+            if len(ranges) <= 3:
+                return ' or '.join(f'c == {first!r}' if first == last else f'{first!r} <= c <= {last!r}'
+                                   for first, last in ranges)
+
+            # a long list of characters is a set, defined once at the top of the module
+            values = bytes(chars) if isinstance(chars[0], int) else ''.join(chars)
+            constant = constants.setdefault(values, f'SET{len(constants)}')
+
+            return f'c in {constant}'
+
+        # the states from which no character leads to a live state: a token ends as soon as it reaches them
+        ends = [all(self.dead[target] for target in self.d[state * self.width : (state + 1) * self.width])
+                for state in range(len(self.accepting))]
+
+        def enter(target: int, indent: str) -> None:
+            if self.accepting[target] != -1 and ends[target]:
+                # the token is complete, unless it is at the end of a word which is not final: the next call must
+                # see whether it continues, like Lexer.scan
+                lines.append(f'{indent}token = {self.accepting[target]}')
+                lines.append(f'{indent}end = i + 1')
+                lines.append(f'{indent}if end < length or final:')
+                lines.append(f'{indent}    break')
+                return
+
+            lines.append(f'{indent}state = {target}')
+
+            if self.accepting[target] != -1:
+                lines.append(f'{indent}token = {self.accepting[target]}')
+                lines.append(f'{indent}end = i + 1')
+
+        # the code of every live state, indented for the leaves of the tree, see below
+        bodies = {}
+
+        for state in range(len(self.accepting)):
+            if self.dead[state]:
+                continue
+
+            lines = bodies[state] = []
+
+            # group the characters by the state they lead to, dead states included. the characters of the
+            # other column, if any, are never listed: they are the ones which match no condition
+            targets = {}
+            for column, chars in characters.items():
+                targets.setdefault(self.d[state * self.width + column], []).extend(chars)
+
+            other = self.d[state * self.width + self.other] if self.other != -1 else None
+            if other is not None and self.dead[other]:
+                other = None
+
+            # consume the characters looping on this state at once
+            if other == state:
+                # every character loops, except the ones leading to another state
+                exits = [c for target, chars in targets.items() if target != state for c in chars]
+
+                if len(exits) == 0:
+                    # the token goes on until the end of the word
+                    lines.append(f'                i = length')
+                    if self.accepting[state] != -1:
+                        lines.append(f'                token = {self.accepting[state]}')
+                        lines.append(f'                end = i')
+                    lines.append(f'                continue')
+                    continue
+
+                exit = condition(exits)
+                loop = f'not ({exit})'
+                other = None
+            elif state in targets:
+                loop = condition(targets[state])
+                exit = f'not ({loop})'
+            else:
+                loop = None
+
+            targets.pop(state, None)
+
+            if loop is not None:
+                lines.append(f'                if {loop}:')
+                lines.append(f'                    i += 1')
+                lines.append(f'                    while i < length:')
+                lines.append(f'                        c = word[i]')
+                lines.append(f'                        if {exit}:')
+                lines.append(f'                            break')
+                lines.append(f'                        i += 1')
+
+                if self.accepting[state] != -1:
+                    lines.append(f'                    token = {self.accepting[state]}')
+                    lines.append(f'                    end = i')
+
+                lines.append(f'                    continue')
+
+            keyword = 'if'
+            for target, chars in targets.items():
+                # the characters leading to the state of the other characters need no test, and neither do the
+                # ones leading to a dead state, unless the other characters lead to a live one
+                if target == other or (self.dead[target] and other is None):
+                    continue
+
+                lines.append(f'                {keyword} {condition(chars)}:')
+                if self.dead[target]:
+                    lines.append(f'                    break')
+                else:
+                    enter(target, '                    ')
+                keyword = 'elif'
+
+            if other is not None:
+                if keyword == 'if':
+                    enter(other, '                ')
+                else:
+                    lines.append(f'                else:')
+                    enter(other, '                    ')
+            elif keyword == 'if':
+                lines.append(f'                break')
+            else:
+                lines.append(f'                else:')
+                lines.append(f'                    break')
+
+        # the tree of comparisons on the state: a scan only enters live states, so every state is one of the leaves
+        states = [state for state in range(len(self.accepting)) if not self.dead[state]]
+        lines = []
+
+        def tree(low: int, high: int, indent: str) -> None:
+            # the subtree of the live states states[low:high]
+            if high - low == 1:
+                lines.extend(indent + line[16:] for line in bodies[states[low]])
+                return
+
+            middle = (low + high) // 2
+
+            lines.append(f'{indent}if state < {states[middle]}:')
+            tree(low, middle, indent + '    ')
+            lines.append(f'{indent}else:')
+            tree(middle, high, indent + '    ')
+
+        if len(states) == 0 or self.dead[self.q0]:
+            # no token can be recognised
+            lines.append(f'            break')
+        else:
+            tree(0, len(states), '            ')
+
+        return '\n'.join([
+            *[f'{name} = frozenset({chars!r})' for chars, name in constants.items()],
+            '',
+            'def scan(word, index, tokens, starts, ends, final=True, until=None):',
+            '    length = len(word)',
+            '    until = length if until is None else min(until, length)',
+            '',
+            '    addToken = tokens.append',
+            '    addStart = starts.append',
+            '    addEnd = ends.append',
+            '',
+            '    while index < until:',
+            f'        state = {self.q0}',
+            '        token = -1',
+            '        end = -1',
+            '',
+            '        i = index',
+            '        while i < length:',
+            '            c = word[i]',
+            '',
+            *lines,
+            '',
+            '            i += 1',
+            '        else:',
+            '            if not final:',
+            '                return index, -1',
+            '',
+            '        if end == -1:',
+            '            return index, i',
+            '',
+            '        addToken(token)',
+            '        addStart(index)',
+            '        addEnd(end)',
+            '',
+            '        index = end',
+            '',
+            '    return index, -1',
+            '',
+        ])
@@ -3,38 +3,56 @@ from .NFA import EPSILON
 from .Regex import Regex
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class Union(Regex):
     left: Regex
     right: Regex
 
-    def thompson(self) -> NFA[int]:
-        # convert left regex to NFA, shift states' values by 1 in order to add initial state 0
-        leftNFA = self.left.thompson().remap_states(lambda x: x + 1)
+    def build(self, nfa: NFA[int]) -> tuple[int, int]:
+        # add a new initial state, the nfas of the left and right regexes and a new final state
+        start = nfa.add_state()
+        leftStart, leftFinal = self.left.build(nfa)
+        rightStart, rightFinal = self.right.build(nfa)
+        final = nfa.add_state()
 
-        # convert right regex to NFA, shift the states' values to prevent duplicate states
-        rightNFA = self.right.thompson().remap_states(lambda x: x + len(leftNFA.K) + 1)
+        # add the new epsilon transitions
+        nfa.add_transition(start, EPSILON, leftStart)
+        nfa.add_transition(start, EPSILON, rightStart)
+        nfa.add_transition(leftFinal, EPSILON, final)
+        nfa.add_transition(rightFinal, EPSILON, final)
 
-        finalState = len(leftNFA.K) + len(rightNFA.K) + 1
+        return start, final
 
-        S = leftNFA.S | rightNFA.S
-    
-        q0 = 0
+    def positions(self, chars: list[frozenset[str]], follow: list[set[int]]) -> tuple[bool, set[int], set[int]]:
+        leftNullable, leftFirst, leftLast = self.left.positions(chars, follow)
+        rightNullable, rightFirst, rightLast = self.right.positions(chars, follow)
 
-        # K contains the states from both left and right NFA's, plus the 2 newly added states
-        K = leftNFA.K | rightNFA.K | {q0, finalState}
-    
-        d = leftNFA.d | rightNFA.d
+        return leftNullable or rightNullable, leftFirst | rightFirst, leftLast | rightLast
 
-        lastStateLeft = list(leftNFA.F)[0]
-        lastStateRight = list(rightNFA.F)[0]
-    
-        lastStateSetLEFT = set() if (lastStateLeft, EPSILON) not in leftNFA.d else leftNFA.d[(lastStateLeft, EPSILON)]
-        lastStateSetRIGHT = set() if (lastStateRight, EPSILON) not in rightNFA.d else rightNFA.d[(lastStateRight, EPSILON)]
+    def character_sets(self) -> list[frozenset[str]]:
+        return self.left.character_sets() + self.right.character_sets()
 
-        # add the new epsilon transitions
-        d[(q0, EPSILON)] = {leftNFA.q0, rightNFA.q0}
-        d[(lastStateLeft, EPSILON)] = lastStateSetLEFT | {finalState}
-        d[(lastStateRight, EPSILON)] = lastStateSetRIGHT | {finalState}
+    def simplify_node(self, nodes: dict[Regex, Regex]) -> Regex:
+        # the alternatives of a chain of unions are simplified, then merged at once; the chain is walked without
+        # recursion, so a long alternation is neither flattened again at every level nor limited by the stack
+        alternatives = []
+        stack = [self]
+
+        while len(stack) > 0:
+            regex = stack.pop()
+
+            if isinstance(regex, Union):
+                stack.extend([regex.right, regex.left])
+            else:
+                alternatives.append(regex.simplify(nodes))
+
+        return Regex.make_alternatives(alternatives)
+
+    def utf8(self) -> Regex:
+        return Union(self.left.utf8(), self.right.utf8())
+
+    def nullable(self) -> bool:
+        return self.left.nullable() or self.right.nullable()
 
-        return NFA(S, K, q0, d, {finalState})
+    def derivative(self, c: str) -> Regex:
+        return Regex.make_union(self.left.derivative(c), self.right.derivative(c))
@@ -0,0 +1,237 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from collections.abc import Callable
+
+from .Lexer import Lexer
+from .main import SPEC
+
+# the benchmark harness of the lexer: it builds lexers for growing specs and splits growing inputs with them,
+# and writes one json record per measurement, so that the results of two releases can be compared.
+# run it with 'python -m src.benchmark'; see parse_args for the options
+
+# the ways to run a lexer: the keyword arguments of Lexer, and whether the scan function is compiled
+ENGINES = {
+    'table': ({}, False),
+    'minimized': ({'minimize': True}, False),
+    'compiled': ({}, True),
+    'linear': ({'linear': True}, False),
+    'glushkov': ({'construction': 'glushkov'}, False),
+    'brzozowski': ({'construction': 'brzozowski'}, False),
+    'lazy': ({'lazy': 1 << 20}, False),
+    'nfa': ({'simulate': True}, False),
+    'nfa-linear': ({'simulate': True, 'linear': True}, False),
+}
+
+def keywords(count: int) -> list[str]:
+    # count distinct lowercase keywords, of 2 to 8 letters
+    generator = random.Random(count)
+    words = set()
+    while len(words) < count:
+        words.add(''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(generator.randint(2, 8))))
+
+    return sorted(words)
+
+def keyword_spec(count: int) -> list[tuple[str, str]]:
+    # a spec with one rule per keyword, followed by the identifiers, the numbers and the spaces
+    spec = [(f'kw_{word}', word) for word in keywords(count)]
+    spec.extend([('id', '[a-zA-Z_][a-zA-Z0-9_]*'), ('number', '[0-9]+'), ('space', '\\ +')])
+
+    return spec
+
+def keyword_input(count: int, size: int) -> str:
+    # about size characters of keywords, identifiers and numbers, separated by spaces
+    generator = random.Random(size)
+    words = keywords(count)
+    pieces = []
+    length = 0
+
+    while length < size:
+        choice = generator.random()
+        if choice < 0.6:
+            piece = generator.choice(words)
+        elif choice < 0.9:
+            piece = generator.choice(words) + '_' + str(generator.randint(0, 99))
+        else:
+            piece = str(generator.randint(0, 100000))
+
+        pieces.append(piece)
+        length += len(piece) + 1
+
+    return ' '.join(pieces)[:size].rstrip()
+
+def lambda_input(size: int) -> str:
+    # about size characters of lambda expressions, made of the lexemes of the lambda language spec of main.py
+    generator = random.Random(size)
+    lexemes = ['lambda ', 'x: ', 'y : ', '(', ') ', ' + ', '++ ', '12 ', '0 ', 'abc ', 'Var ']
+    pieces = []
+    length = 0
+
+    while length < size:
+        piece = generator.choice(lexemes)
+        pieces.append(piece)
+        length += len(piece)
+
+    return ''.join(pieces)[:size]
+
+def blowup_input(n: int, size: int) -> str:
+    # about size characters of words of (a|b)*a(a|b){n}, separated by spaces
+    generator = random.Random(size)
+    pieces = []
+    length = 0
+
+    while length < size:
+        piece = ''.join(generator.choice('ab') for _ in range(generator.randint(0, 2 * n))) + 'a' + \
+            ''.join(generator.choice('ab') for _ in range(n))
+        pieces.append(piece)
+        length += len(piece) + 1
+
+    return ' '.join(pieces)
+
+def measure(function: Callable, repeat: int) -> tuple[float, object]:
+    # the best time of repeat calls of function, and the result of the last call
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+def build(spec: list[tuple[str, str]], engine: str, repeat: int) -> tuple[float, Lexer]:
+    # build a lexer for the spec, timing the build from scratch (without any cache) and the compilation
+    options, compile = ENGINES[engine]
+
+    def make() -> Lexer:
+        lexer = Lexer(spec, **options)
+        if compile and lexer.compile() is None:
+            raise ValueError('the scan function is too large to be compiled')
+        return lexer
+
+    return measure(make, repeat)
+
+def automaton_size(lexer: Lexer) -> dict[str, int]:
+    # the number of states and transitions of the automaton used by the lexer. the transitions of a table are its
+    # entries which do not lead to a dead state; those of a lazy dfa are the ones in its cache, and those of the nfa
+    # simulation are the states and the (state, character) moves of the nfa
+    if lexer.simulator is not None:
+        return {'states': len(lexer.simulator.nfa.states),
+                'transitions': sum(len(moves) for moves in lexer.simulator.nfa.moves)}
+
+    if lexer.lazy is not None:
+        states = lexer.lazy.states.values()
+        return {'states': len(states), 'transitions': sum(len(state.nexts) for state in states)}
+
+    table = lexer.table
+    return {
+        'states': len(table.accepting),
+        'transitions': sum(1 for target in table.d if not table.dead[target]),
+        'columns': table.width,
+    }
+
+def run(suite: str, spec_name: str, spec: list[tuple[str, str]], engines: list[str],
+        inputs: Callable[[int], str], sizes: list[int], repeat: int) -> list[dict]:
+    # measure the build of the spec and the lexing of an input of every size, with every engine
+    records = []
+
+    for engine in engines:
+        try:
+            build_seconds, lexer = build(spec, engine, repeat)
+        except (ValueError, MemoryError, RecursionError) as error:
+            # an invalid combination of options, or a generated scan function too large for the python compiler
+            records.append({'suite': suite, 'spec': spec_name, 'engine': engine, 'error': str(error)})
+            continue
+
+        for size in sizes:
+            text = inputs(size)
+            lex_seconds, lexemes = measure(lambda: lexer.lex(text), repeat)
+
+            # the input generators only produce valid inputs; an error means the lexer is wrong
+            error = lexemes[0][1] if lexemes and lexemes[0][0] == '' else None
+            if error is not None:
+                lexemes = []
+
+            record = {
+                'suite': suite,
+                'spec': spec_name,
+                'rules': len(spec),
+                'engine': engine,
+                'build_seconds': build_seconds,
+                'input_bytes': len(text.encode()),
+                'lex_seconds': lex_seconds,
+                'tokens': len(lexemes),
+                'mb_per_second': len(text.encode()) / lex_seconds / 1e6 if lex_seconds > 0 else None,
+                'tokens_per_second': len(lexemes) / lex_seconds if lex_seconds > 0 else None,
+            }
+            record.update(automaton_size(lexer))
+
+            if error is not None:
+                record['error'] = error
+
+            records.append(record)
+
+    return records
+
+def benchmark(rules: list[int], sizes: list[int], adversarial: list[int], engines: list[str],
+              repeat: int) -> dict:
+    records = []
+
+    # scaling with the number of rules and the size of the input
+    for count in rules:
+        records += run('keywords', f'keywords-{count}', keyword_spec(count), engines,
+                       lambda size, count=count: keyword_input(count, size), sizes, repeat)
+
+    # the lambda language of main.py
+    records += run('lambda', 'lambda', SPEC, engines, lambda_input, sizes, repeat)
+
+    # the longest match rule makes a backtracking lexer quadratic on a run of a's: every token 'a' is found
+    # only after reading the rest of the run looking for a 'b'. linear lexing stays linear
+    records += run('backtracking', 'a|a*b', [('a', 'a'), ('ab', 'a*b')], engines,
+                   lambda size: 'a' * size, adversarial, repeat)
+
+    # the dfa of (a|b)*a(a|b){n} has about 2^(n+1) states; the lazy dfa only builds the ones the input reaches,
+    # and the nfa simulation none
+    for n in [4, 8, 10]:
+        spec = [('word', f'(a|b)*a(a|b){{{n}}}'), ('space', '\\ +')]
+        records += run('blowup', f'(a|b)*a(a|b){{{n}}}', spec, engines,
+                       lambda size, n=n: blowup_input(n, size), sizes, repeat)
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': records,
+    }
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the build and the throughput of the lexer.')
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 50, 100, 500],
+                        help='numbers of keyword rules of the specs')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='input sizes in bytes (e.g. 100000000 for 100 MB)')
+    parser.add_argument('--adversarial', type=int, nargs='+', default=[1000, 2000, 4000],
+                        help='input sizes of the adversarial cases, whose lexing may be quadratic')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=['table', 'compiled', 'linear', 'lazy'],
+                        help='the ways to run the lexer')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs of every measurement (the best is kept)')
+    parser.add_argument('--output', help='the json file to write the results to, instead of the standard output')
+
+    return parser.parse_args(args)
+
+def main(args: list[str] | None = None) -> None:
+    options = parse_args(args)
+    results = benchmark(options.rules, options.sizes, options.adversarial, options.engines, options.repeat)
+
+    if options.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
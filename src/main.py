@@ -1,7 +1,20 @@
+import os
 import sys
 from .Lexer import Lexer
 from .Tree import Tree
 
+# the lexer specification of the lambda language
+SPEC = [
+	("number", r'(\ )*(0|([1-9][0-9]*)+)(\ )*'),
+	("open", r'(\ )*\((\ )*'),
+	("close", r'(\ )*\)(\ )*'),
+	("sum", r'(\ )*\+(\ )*'),
+	("concat", r'(\ )*\+\+(\ )*'),
+	("lambda", r'(\ )*lambda(\ )*'),
+	("id", r'(\ )*([a-z]|[A-Z])+(\ )*:(\ )*'),
+	("var", r'(\ )*([a-z]|[A-Z])+(\ )*')
+]
+
 # function used for debugging purposes only
 def print_tree(tree):
 	queue = [tree]
@@ -205,26 +218,17 @@ def main():
 	if len(sys.argv) != 2:
 		return
 	
-	# read the string from the input file, remove newlines and tabs
-	file = open(sys.argv[1], "r")
-	string = file.read().replace('\n', '').replace('\t', '')
-	file.close()
-
-	# define the lexer specification
-	spec = [
-		("number", r'(\ )*(0|([1-9][0-9]*)+)(\ )*'),
-		("open", r'(\ )*\((\ )*'),
-		("close", r'(\ )*\)(\ )*'),
-		("sum", r'(\ )*\+(\ )*'),
-		("concat", r'(\ )*\+\+(\ )*'),
-		("lambda", r'(\ )*lambda(\ )*'),
-		("id", r'(\ )*([a-z]|[A-Z])+(\ )*:(\ )*'),
-		("var", r'(\ )*([a-z]|[A-Z])+(\ )*')
-	]
-
-	# use the lexer to split the string into lexemes
-	lexer = Lexer(spec)
-	lexemes = lexer.lex(string)
+	# use the lexer to split the string into lexemes; the lexer tables are cached between runs, in the
+	# directory given by the LEXER_CACHE environment variable, or in the cache directory of the user, which
+	# other users cannot write to (unlike a shared temporary directory)
+	home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	cache = os.environ.get('LEXER_CACHE', os.path.join(home, 'lexer'))
+	lexer = Lexer(SPEC, cache=cache)
+
+	# read the input file in chunks, remove newlines and tabs
+	with open(sys.argv[1], "r") as file:
+		chunks = (chunk.replace('\n', '').replace('\t', '') for chunk in iter(lambda: file.read(65536), ''))
+		lexemes = list(lexer.lex_stream(chunks))
 
 	# initialize the root
 	tree = Tree(lexemes[0][0], lexemes[0][0], None)
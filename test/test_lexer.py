@@ -1,11 +1,23 @@
+import asyncio
+import dataclasses
+import importlib.util
+import io
+import json
+import mmap
+import os
+import tempfile
 import unittest
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 
 from src.Lexer import Lexer
+from src.TransitionTable import TransitionTable
+from src.benchmark import benchmark
 
 class TestLexer(unittest.TestCase):
     tests_passed: int = 0
-    tests_count: int = 2
+    tests_count: int = 24
 
     def __init__(self, methodName: str = "runTest") -> None:
         super().__init__(methodName)
@@ -145,3 +157,873 @@ class TestLexer(unittest.TestCase):
         self.run_tests(lexer, tests)
 
         self.__class__.tests_passed += 1
+
+    def test_many_tokens(self):
+        # more than ten tokens: the first matching token in the spec must win regardless of its index
+        spec = [(f"digit{i}", str(i)) for i in range(10)] + [
+            ("space", "\\ "),
+            ("if", "if"),
+            ("else", "else"),
+            ("id", "[a-z]+"),
+        ]
+
+        lexer = Lexer(spec)
+
+        tests = [
+            (
+                "if else iff 7",
+                [
+                    ("if", "if"),
+                    ("space", " "),
+                    ("else", "else"),
+                    ("space", " "),
+                    ("id", "iff"),
+                    ("space", " "),
+                    ("digit7", "7"),
+                ]
+            ),
+        ]
+
+        self.run_tests(lexer, tests)
+
+        self.__class__.tests_passed += 1
+
+    def test_error(self):
+        spec = [
+            ("newline", "\n"),
+            ("word", "[a-z]+"),
+        ]
+
+        lexer = Lexer(spec)
+
+        self.assertEqual(lexer.lex("ab\ncd\nx#y"), [("", "No viable alternative at character 1, line 2")])
+        self.assertEqual(lexer.lex("ab\n9"), [("", "No viable alternative at character 0, line 1")])
+
+        self.__class__.tests_passed += 1
+
+    def test_minimize(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+        minimal = Lexer(spec, minimize=True)
+
+        self.assertLess(len(minimal.dfa.K), len(lexer.dfa.K))
+
+        for word in ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#"]:
+            self.assertEqual(minimal.lex(word), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_alphabet_classes(self):
+        spec = [
+            ("space", "\\ "),
+            ("if", "if"),
+            ("id", "[a-z]([a-z]|[0-9])*"),
+            ("number", "[0-9]+"),
+        ]
+
+        lexer = Lexer(spec)
+
+        # space, i, f, the other letters and the digits
+        self.assertEqual(lexer.table.width, 5)
+        self.assertEqual(len(lexer.dfa.S), 5)
+
+        tests = [
+            (
+                "if iff x9 42",
+                [
+                    ("if", "if"),
+                    ("space", " "),
+                    ("id", "iff"),
+                    ("space", " "),
+                    ("id", "x9"),
+                    ("space", " "),
+                    ("number", "42"),
+                ]
+            ),
+        ]
+
+        self.run_tests(lexer, tests)
+
+        self.__class__.tests_passed += 1
+
+    def test_cache(self):
+        spec = [
+            ("space", "\\ "),
+            ("if", "if"),
+            ("id", "[a-z]([a-z]|[0-9])*"),
+            ("number", "[0-9]+"),
+        ]
+
+        word = "if iff x9 42"
+
+        with tempfile.TemporaryDirectory() as cache:
+            lexer = Lexer(spec, cache=cache)
+            self.assertIsNotNone(lexer.dfa)
+
+            # the second lexer loads the table written by the first one
+            cached = Lexer(spec, cache=cache)
+            self.assertIsNone(cached.dfa)
+            self.assertEqual(cached.table, lexer.table)
+            self.assertEqual(cached.lex(word), lexer.lex(word))
+
+            # a different specification does not use the same table
+            other = Lexer(spec[:-1], cache=cache)
+            self.assertIsNotNone(other.dfa)
+
+            # a corrupted cache file is ignored and rebuilt
+            for name in os.listdir(cache):
+                with open(os.path.join(cache, name), 'wb') as file:
+                    file.write(b'garbage')
+
+            rebuilt = Lexer(spec, cache=cache)
+            self.assertIsNotNone(rebuilt.dfa)
+            self.assertEqual(rebuilt.lex(word), lexer.lex(word))
+
+            # so is a well formed table with a state, a column or a token out of range
+            table = lexer.table
+            d = table.d[:]
+            d[0] = len(table.accepting)
+            accepting = table.accepting[:]
+            accepting[-1] = len(spec)
+            tables = [dataclasses.replace(table, d=d), dataclasses.replace(table, q0=len(table.accepting)),
+                      dataclasses.replace(table, columns={**table.columns, 'z': table.width}),
+                      dataclasses.replace(table, other=table.width), dataclasses.replace(table, accepting=accepting)]
+
+            for invalid in tables[:-1]:
+                self.assertRaises(ValueError, TransitionTable.from_bytes, invalid.to_bytes())
+
+            for invalid in tables:
+                for name in os.listdir(cache):
+                    with open(os.path.join(cache, name), 'wb') as file:
+                        file.write(invalid.to_bytes())
+
+                rebuilt = Lexer(spec, cache=cache)
+                self.assertIsNotNone(rebuilt.dfa)
+                self.assertEqual(rebuilt.lex(word), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_stream(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+
+        word = "bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x \n" * 20
+
+        # tokens straddling the chunk boundaries must be the same as when lexing the whole word
+        for chunk_size in [1, 2, 7, 64, 10000]:
+            self.assertEqual(list(lexer.lex_stream(io.StringIO(word), chunk_size)), lexer.lex(word))
+
+        chunks = [word[i : i + 5] for i in range(0, len(word), 5)]
+        self.assertEqual(list(lexer.lex_stream(chunks)), lexer.lex(word))
+
+        # the position of an error is counted from the start of the stream
+        tokens = list(lexer.lex_stream(io.StringIO("x \n  abc\n   ab#"), 3))
+
+        self.assertEqual(tokens[:5], [("token4", "x"), ("space", " "), ("newline", "\n"), ("space", " "), ("space", " ")])
+        self.assertEqual(tokens[-1], ("", "No viable alternative at character 5, line 2"))
+        self.assertEqual(tokens[-1], lexer.lex("x \n  abc\n   ab#")[0])
+
+        # the input ends in the middle of a token, after a shorter match
+        lexer = Lexer([("a", "a"), ("abc", "abc")])
+
+        self.assertEqual(lexer.lex("aabc"), [("a", "a"), ("abc", "abc")])
+        self.assertEqual(lexer.lex("ab"), [("", "No viable alternative at character 1, line 0")])
+        self.assertEqual(list(lexer.lex_stream(["a", "b"])), [("a", "a"), ("", "No viable alternative at character 1, line 0")])
+
+        # a token spanning many chunks, and a longer match failing chunks after the end of a shorter one
+        spec = [("string", '"[^"]*"'), ("quote", '"'), ("id", "[a-z]+"), ("space", "\\ +")]
+        word = 'ab "' + "x y " * 500 + '" cd "ef gh'
+
+        for options in [{}, {'linear': True}, {'lazy': 1 << 20}, {'simulate': True}]:
+            lexer = Lexer(spec, **options)
+            reference = list(lexer.lex_stream([word]))
+
+            self.assertEqual(reference[:4], [("id", "ab"), ("space", " "), ("string", word[3:2005]), ("space", " ")])
+            self.assertEqual(reference[-4:], [("quote", '"'), ("id", "ef"), ("space", " "), ("id", "gh")])
+
+            for chunk_size in [1, 3, 64]:
+                chunks = [word[i : i + chunk_size] for i in range(0, len(word), chunk_size)]
+                self.assertEqual(list(lexer.lex_stream(chunks)), reference)
+
+        self.__class__.tests_passed += 1
+
+    def test_spans(self):
+        spec = [
+            ("space", "\\ "),
+            ("if", "if"),
+            ("id", "[a-z]([a-z]|[0-9])*"),
+            ("number", "[0-9]+"),
+        ]
+
+        lexer = Lexer(spec)
+
+        spans = lexer.lex_spans("if iff x9 42")
+
+        self.assertIsNone(spans.error)
+        self.assertEqual(list(spans), [(1, 0, 2), (0, 2, 3), (2, 3, 6), (0, 6, 7), (2, 7, 9), (0, 9, 10), (3, 10, 12)])
+        self.assertEqual([spans[i] for i in range(len(spans))], lexer.lex("if iff x9 42"))
+
+        spans = lexer.lex_spans("if x#")
+
+        self.assertEqual(len(spans), 3)
+        self.assertEqual(spans.lexeme(2), "x")
+        self.assertEqual(spans.error, "No viable alternative at character 4, line 0")
+
+        self.__class__.tests_passed += 1
+
+    def test_linear(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+        linear = Lexer(spec, linear=True)
+
+        for word in ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "ababab ab\nabx", "aaaa#", "abcaQwe12 xyyabc1\nab"]:
+            self.assertEqual(linear.lex(word), lexer.lex(word))
+
+        # every token reads the rest of the run of a's when backtracking
+        spec = [
+            ("ab", "a*b"),
+            ("a", "a"),
+            ("c", "c"),
+        ]
+
+        lexer = Lexer(spec)
+        linear = Lexer(spec, linear=True)
+
+        for word in ["a" * 500, "a" * 500 + "b", "a" * 300 + "c" + "a" * 300 + "b", "a" * 200 + "#", "aacab"]:
+            self.assertEqual(linear.lex(word), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_parallel(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+
+        # chunks mostly start in the middle of tokens, and the long token spans several chunks
+        word = "bbaqcbbyabc67895 18955aa1a7   Ghj78112a010101x " * 30 + "a" * 100 + "\nab Qwe\n" * 30
+
+        self.assertEqual(lexer.lex_parallel(word, 2, 7), lexer.lex(word))
+        self.assertEqual(lexer.lex_parallel(word, 3, 40), lexer.lex(word))
+
+        word = word[:500] + "#" + word[500:]
+        self.assertEqual(lexer.lex_parallel(word, 2, 64), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_many(self):
+        spec = [
+            ("space", "\\ "),
+            ("if", "if"),
+            ("id", "[a-z]([a-z]|[0-9])*"),
+            ("number", "[0-9]+"),
+        ]
+
+        words = ["if iff x9 42", "", "x#", "12 ab", "if"]
+
+        for lexer in [Lexer(spec), Lexer(spec, linear=True)]:
+            batch = lexer.lex_many(iter(words))
+
+            self.assertEqual(batch.sources, words)
+            self.assertEqual(list(batch.inputs), [0] * 7 + [2] + [3] * 3 + [4])
+            self.assertEqual(list(batch)[7], (2, 2, 0, 1))
+            self.assertEqual(batch[7], ("id", "x"))
+            self.assertEqual(batch.errors, {2: "No viable alternative at character 1, line 0"})
+
+            for i, word in enumerate(words):
+                self.assertEqual(batch.result(i), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_glushkov(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+        glushkov = Lexer(spec, construction='glushkov')
+
+        for word in ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#"]:
+            self.assertEqual(glushkov.lex(word), lexer.lex(word))
+
+        self.assertRaises(ValueError, Lexer, spec, construction='unknown')
+
+        self.__class__.tests_passed += 1
+
+    def test_brzozowski(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+        brzozowski = Lexer(spec, construction='brzozowski')
+        minimal = Lexer(spec, minimize=True)
+
+        for word in ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#"]:
+            self.assertEqual(brzozowski.lex(word), lexer.lex(word))
+
+        # the derivatives are close to the minimal dfa, far from the subset construction
+        self.assertLessEqual(len(minimal.dfa.K), len(brzozowski.dfa.K))
+        self.assertLess(len(brzozowski.dfa.K), len(lexer.dfa.K))
+
+        self.__class__.tests_passed += 1
+
+    def test_lazy(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+        ]
+
+        lexer = Lexer(spec)
+        words = ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#"]
+
+        # a cache large enough for the whole dfa, and one which only holds a few states
+        for budget in [1 << 20, 2000]:
+            lazy = Lexer(spec, lazy=budget)
+
+            for word in words * 3:
+                self.assertEqual(lazy.lex(word), lexer.lex(word))
+
+            self.assertGreater(lazy.lazy.hits, 0)
+            self.assertGreater(lazy.lazy.misses, 0)
+            self.assertLessEqual(lazy.lazy.used, budget)
+
+        self.assertGreater(lazy.lazy.evictions, 0)
+
+        # no cached state refers to an evicted one: every state is cached once, under its set of nfa states
+        for state in lazy.lazy.states.values():
+            for target in state.nexts.values():
+                self.assertIs(lazy.lazy.states.get(target.mask), target)
+
+        # a budget for a single state: every transition empties the cache
+        tiny = Lexer(spec, lazy=1)
+        self.assertEqual(tiny.lex(words[0]), lexer.lex(words[0]))
+        self.assertGreater(tiny.lazy.resets, 0)
+
+        resets = lazy.lazy.resets
+        lazy.lazy.reset()
+        self.assertEqual(lazy.lazy.resets, resets + 1)
+        self.assertEqual(lazy.lex(words[0]), lexer.lex(words[0]))
+
+        # the dfa of this spec has 2^16 states: the lazy dfa only computes the ones the input reaches
+        lazy = Lexer([("word", "(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)")], lazy=1 << 16)
+        word = "ab" * 1000
+
+        self.assertEqual(lazy.lex(word), [("word", word)])
+        self.assertLessEqual(lazy.lazy.used, 1 << 16)
+
+        self.assertRaises(ValueError, Lexer, spec, linear=True, lazy=1 << 20)
+
+        self.__class__.tests_passed += 1
+
+    def test_simulate(self):
+        spec = [
+            ("space", "\\ "),
+            ("newline", "\n"),
+            ("token1", "(a|b)*q+cb[0-9]*"),
+            ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+            ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+            ("token4", "(0|1)*x+y?"),
+            ("token5", "([0-9]|a)*"),
+            ("other", "[^a-z\\ \n]"),
+        ]
+
+        lexer = Lexer(spec)
+        words = ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#", "ab-!", "abx"]
+
+        for linear in [False, True]:
+            for construction in ['thompson', 'glushkov']:
+                simulator = Lexer(spec, linear=linear, construction=construction, simulate=True)
+                self.assertIsNone(simulator.table)
+
+                for word in words:
+                    self.assertEqual(simulator.lex(word), lexer.lex(word))
+
+        # the earliest rule wins among the longest matches
+        simulator = Lexer([("if", "if"), ("id", "[a-z]+"), ("space", "\\ ")], simulate=True)
+        self.assertEqual(simulator.lex("if iff"), [("if", "if"), ("space", " "), ("id", "iff")])
+
+        # the dfa of this spec has 2^21 states, the simulation only keeps the nfa
+        simulator = Lexer([("word", "(a|b)*a(a|b){20}")], simulate=True)
+        word = "ab" * 1000 + "a"
+        self.assertEqual(simulator.lex(word), [("word", word)])
+
+        # a run of a's makes every token read the rest of the run, unless the failed states are remembered
+        simulator = Lexer([("a", "a"), ("ab", "a*b")], linear=True, simulate=True)
+        self.assertEqual(simulator.lex("a" * 1000), [("a", "a")] * 1000)
+        self.assertEqual(simulator.lex("a" * 1000 + "b"), [("ab", "a" * 1000 + "b")])
+
+        self.assertRaises(ValueError, Lexer, spec, lazy=1 << 20, simulate=True)
+        self.assertRaises(ValueError, Lexer, spec, construction='brzozowski', simulate=True)
+
+        self.__class__.tests_passed += 1
+
+    def test_negated_class(self):
+        spec = [
+            ("string", '"[^"\\n]*"'),
+            ("space", "\\s+"),
+            ("id", "[a-zA-Z_]\\w*"),
+            ("number", "\\d{1,3}"),
+        ]
+
+        # characters which do not appear in the spec can only be part of a string
+        word = 'x = "h\u00e9llo, w\u00f6rld" 12345'
+        reference = [
+            ("id", "x"),
+            ("space", " "),
+        ]
+
+        with tempfile.TemporaryDirectory() as cache:
+            for lexer in [Lexer(spec), Lexer(spec, minimize=True), Lexer(spec, construction='glushkov'),
+                          Lexer(spec, construction='brzozowski'), Lexer(spec, lazy=1 << 16), Lexer(spec, cache=cache),
+                          Lexer(spec, cache=cache)]:
+                self.assertEqual(lexer.lex(word), [("", "No viable alternative at character 2, line 0")])
+                self.assertEqual(lexer.lex('"h\u00e9llo" 12345'), [("string", '"h\u00e9llo"'), ("space", " "),
+                                                                 ("number", "123"), ("number", "45")])
+                self.assertEqual(lexer.lex('"ab'), [("", "No viable alternative at character EOF, line 0")])
+
+        self.__class__.tests_passed += 1
+
+    def test_compile(self):
+        specs = [
+            [
+                ("space", "\\ "),
+                ("newline", "\n"),
+                ("token1", "(a|b)*q+cb[0-9]*"),
+                ("token2", "(a|b|c)*[A-Z][a-z]+[0-9]*"),
+                ("token3", "[a-b]*[x-z]*abc[0-9]*"),
+                ("token4", "(0|1)*x+y?"),
+                ("token5", "([0-9]|a)*"),
+            ],
+            [
+                ("string", '"[^"]*"'),
+                ("space", "\\s+"),
+                ("if", "if"),
+                ("id", "[a-zA-Z_]\\w*"),
+                ("number", "\\d+"),
+                ("operator", "[=+;]"),
+            ],
+        ]
+        words = ["bbaqcbbyabc67895\n18955aa1a7   Ghj78112a010101x ", "abcaQwe12 xyyabc1\n", "ab#",
+                 'if x = "h\u00e9llo\n" + y_2;\n', 'x = "unterminated', "", "+"]
+
+        for spec in specs:
+            lexer = Lexer(spec)
+            compiled = Lexer(spec)
+            compiled.compile()
+
+            for word in words:
+                self.assertEqual(compiled.lex(word), lexer.lex(word))
+                self.assertEqual(list(compiled.lex_stream(iter(word))), list(lexer.lex_stream(iter(word))))
+
+            self.assertEqual(compiled.lex_many(words), lexer.lex_many(words))
+
+        # the generated module can be imported to build the lexer without any automaton
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'generated_lexer.py')
+            with open(path, 'w') as file:
+                file.write(Lexer(spec).generate_source())
+
+            moduleSpec = importlib.util.spec_from_file_location('generated_lexer', path)
+            module = importlib.util.module_from_spec(moduleSpec)
+            moduleSpec.loader.exec_module(module)
+
+            imported = Lexer.from_module(module)
+            self.assertEqual(imported.lex(words[3]), lexer.lex(words[3]))
+
+        self.assertRaises(ValueError, Lexer(spec, linear=True).generate_source)
+
+        # the initial state of a minimized or brzozowski dfa may recognise a token and loop on itself: the compiled
+        # scan finds the same tokens as the scan of the transition table
+        specs += [[("r0", "[ab]*"), ("r1", "[a-b]")], [("word", "[a-z]*")], [("x", "x*"), ("ab", "(a|b)*c?")]]
+        words += ["b", "ab", "abxxab c", "zz!"]
+
+        for spec in specs:
+            for options in [{"minimize": True}, {"construction": "brzozowski"}]:
+                lexer = Lexer(spec, **options)
+                compiled = Lexer(spec, **options)
+                compiled.compile()
+
+                for word in words:
+                    expected = (array('i'), array('q'), array('q'))
+                    result = (array('i'), array('q'), array('q'))
+                    self.assertEqual(compiled.compiled(word, 0, *result), lexer.scan(word, 0, *expected))
+                    self.assertEqual(result, expected)
+                    self.assertEqual(compiled.lex(word), lexer.lex(word))
+
+        # a dfa with thousands of states compiles too: the code of a state is found through a tree of comparisons
+        spec = [("word", "(a|b)*a(a|b){10}"), ("space", "\\ ")]
+        word = "abbabababbbaab ababababbbbabab aaaaaaaaaaaaaaaa"
+
+        lexer = Lexer(spec)
+        compiled = Lexer(spec)
+        self.assertGreater(len(compiled.table.accepting), 2000)
+        self.assertIsNotNone(compiled.compile())
+        self.assertEqual(compiled.lex(word), lexer.lex(word))
+
+        self.__class__.tests_passed += 1
+
+    def test_binary(self):
+        spec = [
+            ("string", '"[^"]*"'),
+            ("space", "\\s+"),
+            ("id", "[a-zA-Z_\u00e9]\\w*"),
+            ("number", "\\d+"),
+            ("symbol", "[\u4e16\u754c]"),
+        ]
+
+        text = 'x "h\u00e9llo \u4e16\u754c" \u00e9t\u00e9 \u4e16 42\n'
+        data = text.encode()
+
+        # the tokens are the same as those of the text, with the lexemes encoded
+        reference = [(name, lexeme.encode()) for name, lexeme in Lexer(spec).lex(text)]
+
+        with tempfile.TemporaryDirectory() as cache:
+            lexers = [Lexer(spec, binary=True), Lexer(spec, binary=True, construction='brzozowski'),
+                      Lexer(spec, binary=True, lazy=1 << 16), Lexer(spec, binary=True, cache=cache),
+                      Lexer(spec, binary=True, cache=cache)]
+            lexers[0].compile()
+
+            for lexer in lexers:
+                for buffer in [data, bytearray(data), memoryview(data)]:
+                    self.assertEqual(lexer.lex(buffer), reference)
+
+                self.assertEqual(list(lexer.lex_stream(io.BytesIO(data), 3)), reference)
+
+        lexer = lexers[-1]
+
+        # the offsets are byte offsets
+        spans = lexer.lex_spans(data)
+        self.assertEqual((spans.starts[2], spans.ends[2]), (2, len('x "h\u00e9llo \u4e16\u754c"'.encode())))
+
+        # a memory mapped file is lexed without reading it first
+        with tempfile.TemporaryFile() as file:
+            file.write(data * 100)
+            file.flush()
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self.assertEqual(lexer.lex(buffer), reference * 100)
+
+        self.assertEqual(lexer.lex(b'x\n# y'), [("", "No viable alternative at character 0, line 1")])
+        self.assertEqual(lexer.lex(b'"open'), [("", "No viable alternative at character EOF, line 0")])
+
+        self.__class__.tests_passed += 1
+
+    def test_document(self):
+        spec = [
+            ("keyword", "if|else"),
+            ("id", "[a-z]+"),
+            ("number", "[0-9]+"),
+            ("string", '"[^"]*"'),
+            ("space", "\\ +"),
+        ]
+
+        lexer = Lexer(spec)
+        text = 'if x "s" 12 else y ' * 100
+
+        document = lexer.lex_document(text)
+        self.assertEqual(list(document.spans()), list(lexer.lex_spans(text)))
+
+        # typing in a keyword only lexes it again
+        self.assertEqual(document.edit(1001, 0, "abc"), (632, 1, 1))
+        self.assertEqual(document[632], ("id", "eabclse"))
+
+        # the tokens after the edit keep their token, with moved offsets
+        text = text[:1001] + "abc" + text[1001:]
+        self.assertEqual(document[633], ("space", " "))
+        self.assertEqual(document[634], ("id", "y"))
+
+        # an unterminated string changes all the tokens after it, until the text fails to split
+        edits = [(5, 0, '"'), (5, 1, ''), (0, 2, 'else'), (len(text) - 1, 1, ''), (40, 10, '12 34'), (3, 0, '"')]
+        for offset, deleted, inserted in edits:
+            document.edit(offset, deleted, inserted)
+            text = text[:offset] + inserted + text[offset + deleted:]
+
+            expected = lexer.lex_spans(text)
+            spans = document.spans()
+            self.assertEqual(list(spans), list(expected))
+            self.assertEqual(spans.error, expected.error)
+
+        self.assertIsNotNone(spans.error)
+        self.assertRaises(ValueError, document.edit, len(text), 1, '')
+
+        # a token before an error may read past the error, looking for a longer match: an edit after the error
+        # can still change it
+        lexer = Lexer([("r0", "((a)((b)([bc])))([bc])"), ("r1", "([ac])?")])
+        document = lexer.lex_document("acabca")
+        self.assertIsNotNone(document.spans().error)
+
+        document.edit(5, 1, "b")
+        expected = lexer.lex_spans("acabcb")
+        spans = document.spans()
+        self.assertEqual(list(spans), list(expected))
+        self.assertEqual(spans.error, expected.error)
+        self.assertEqual(document[2], ("r0", "abcb"))
+
+        self.__class__.tests_passed += 1
+
+    def test_benchmark(self):
+        results = benchmark([5], [200], [50], ['table', 'lazy'], 1)
+
+        # a record for every spec (5 keywords, lambda, backtracking and 3 blowups) and engine, machine-readable
+        records = json.loads(json.dumps(results))['results']
+        self.assertEqual(len(records), 6 * 2)
+
+        for record in records:
+            self.assertNotIn('error', record, f'the benchmark of {record["spec"]} failed')
+            self.assertGreater(record['tokens'], 0)
+            self.assertGreater(record['states'], 0)
+            self.assertGreater(record['mb_per_second'], 0)
+
+        self.__class__.tests_passed += 1
+
+    def test_add_remove_rule(self):
+        spec = [
+            ("keyword", "if|else"),
+            ("id", "[a-z]+"),
+            ("space", "\\ +"),
+        ]
+
+        words = ['if x else y', 'iff 12 x1', 'while "s" 3.5', 'elsewhere 007 ', '"a b" if']
+
+        for options in [{}, {'construction': 'glushkov'}, {'minimize': True}, {'lazy': 1 << 20}, {'simulate': True},
+                        {'binary': True}]:
+            lexer = Lexer(spec, **options)
+            regexes = len(lexer.fragments.regexes)
+
+            lexer.add_rule("number", "[0-9]+(\\.[0-9]+)?")
+            lexer.add_rule("string", '"[^"]*"')
+            lexer.remove_rule("keyword")
+            lexer.add_rule("while", "while")
+
+            # the rules which did not change are not parsed again, and the removed rule is forgotten
+            self.assertEqual(len(lexer.fragments.regexes), regexes + 2)
+            self.assertEqual(set(lexer.fragments.regexes), {(regex, lexer.binary) for _, regex in lexer.spec})
+
+            expected = Lexer(lexer.spec, **options)
+            self.assertEqual([name for name, _ in lexer.spec], ["id", "space", "number", "string", "while"])
+
+            for word in words:
+                word = word.encode() if options.get('binary') else word
+                self.assertEqual(lexer.lex(word), expected.lex(word), f'unexpected lexemes of "{word}" with {options}')
+
+        self.assertRaises(ValueError, lexer.remove_rule, "keyword")
+
+        # the fragments of a spec edited many times do not grow
+        lexer = Lexer(spec)
+        for i in range(50):
+            lexer.add_rule("reloaded", f"x{i}y+")
+            lexer.remove_rule("reloaded")
+
+        self.assertEqual(len(lexer.fragments.regexes), len(spec))
+        self.assertLessEqual(len(lexer.fragments.nfas), len(spec))
+        self.assertLessEqual(len(lexer.fragments.nodes), len(Lexer(spec).fragments.nodes))
+
+        # a compiled lexer is compiled again
+        lexer = Lexer(spec)
+        lexer.compile()
+        lexer.add_rule("number", "[0-9]+")
+        self.assertEqual(lexer.lex('x 12'), [("id", "x"), ("space", " "), ("number", "12")])
+
+        self.__class__.tests_passed += 1
+
+    def test_async(self):
+        spec = [
+            ("keyword", "if|else"),
+            ("id", "[a-z\u00e9]+"),
+            ("number", "[0-9]+"),
+            ("space", "\\ +"),
+        ]
+
+        lexer = Lexer(spec)
+        word = "if x 12 else caf\u00e9 " * 500
+
+        async def collect(readable, **options) -> list[tuple[str, str]]:
+            return [token async for token in lexer.lex_async(readable, **options)]
+
+        async def chunks(text: str, size: int):
+            for i in range(0, len(text), size):
+                yield text[i : i + size]
+
+        async def from_reader(data: bytes, **options) -> list[tuple[str, str]]:
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return await collect(reader, **options)
+
+        # the utf-8 encoding of a character may be split between two reads of the stream
+        for chunk_size in [1, 7, 10000]:
+            self.assertEqual(asyncio.run(from_reader(word.encode(), chunk_size=chunk_size)), lexer.lex(word))
+
+        self.assertEqual(asyncio.run(collect(chunks(word, 5), slice_size=3)), lexer.lex(word))
+        self.assertEqual(asyncio.run(collect(chunks("x 12 #", 2))), list(lexer.lex_stream(["x 12 #"])))
+
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(asyncio.run(collect(chunks(word, 1000), slice_size=100, executor=executor)), lexer.lex(word))
+
+        # other tasks run while a large chunk is lexed
+        async def concurrent() -> int:
+            ticks = 0
+            done = False
+
+            async def tick() -> None:
+                nonlocal ticks
+                while not done:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(tick())
+            await collect(chunks(word, len(word)), slice_size=100)
+            done = True
+            await task
+
+            return ticks
+
+        self.assertGreaterEqual(asyncio.run(concurrent()), len(word) // 100)
+
+        # a token longer than a slice is read once: its scan is resumed with every slice instead of starting again
+        spec = spec + [("string", '"[^"]*"')]
+        lexer = Lexer(spec)
+        word = 'x "' + "a" * 20000 + '" 12'
+        scanned = []
+        scan = lexer.scan
+
+        def counted(text, *arguments):
+            scanned.append(len(text))
+            return scan(text, *arguments)
+
+        lexer.scan = counted
+        self.assertEqual(asyncio.run(collect(chunks(word, 1000), slice_size=100)), Lexer(spec).lex(word))
+        self.assertLess(sum(scanned), 2 * len(word))
+
+        # a binary lexer reads the bytes of the stream
+        lexer = Lexer(spec, binary=True)
+        self.assertEqual(asyncio.run(from_reader(word.encode(), chunk_size=3)), lexer.lex(word.encode()))
+
+        self.__class__.tests_passed += 1
+
+    def test_profile(self):
+        spec = [("a", "a"), ("ab", "a*b"), ("space", "\\ ")]
+
+        self.assertIsNone(Lexer(spec).profile)
+
+        lexer = Lexer(spec, profile=True)
+        profile = lexer.profile
+
+        self.assertEqual(list(profile.phases), ["parse", "nfa", "merge", "subset construction", "compile"])
+        self.assertEqual(profile.sizes["dfa_states"], profile.sizes["table_states"])
+        self.assertGreater(profile.sizes["nfa_states"], profile.sizes["dfa_states"])
+
+        # every token 'a' reads the rest of the run of a's and the space after it, looking for a 'b'; the space
+        # reads the next character too
+        self.assertEqual(lexer.lex("a" * 10 + " ab"), Lexer(spec).lex("a" * 10 + " ab"))
+        self.assertEqual(profile.input, 13)
+        self.assertEqual(profile.characters, 65 + 2 + 2)
+        self.assertEqual(profile.rescans, 55 + 1)
+        self.assertEqual(profile.tokens, {"a": 10, "space": 1, "ab": 1})
+
+        # the scans of lex_spans and lex_stream are counted too
+        lexer.lex_spans("ab #")
+        list(lexer.lex_stream(["a", "b#"]))
+        self.assertEqual(profile.errors, 2)
+        self.assertEqual(profile.tokens["ab"], 3)
+
+        report = json.loads(json.dumps(profile.report()))
+        self.assertEqual(report["scans"], profile.scans)
+        self.assertGreater(report["seconds_per_mb"], 0)
+
+        profile.reset()
+        self.assertEqual((profile.scans, profile.characters, profile.tokens), (0, 0, {}))
+
+        # the automata simulating the nfa have no dfa
+        for options in [{'lazy': 1 << 20}, {'simulate': True}]:
+            lexer = Lexer(spec, profile=True, **options)
+            self.assertEqual(list(lexer.profile.phases), ["parse", "nfa", "merge", "bits"])
+
+            lexer.lex("aaab")
+            self.assertEqual(lexer.profile.tokens, {"ab": 1})
+
+        # lex_many and lex_parallel count the same tokens as lex, the chunks scanned by the workers included
+        word = ("a" * 10 + " ab ") * 2000
+        measures = lambda profile: (profile.input, profile.characters, profile.rescans, profile.tokens)
+
+        lexer = Lexer(spec, profile=True)
+        lexer.lex(word)
+        expected = measures(lexer.profile)
+
+        for split in [lambda lexer: lexer.lex_many([word]), lambda lexer: lexer.lex_parallel(word, 2, 5000)]:
+            lexer = Lexer(spec, profile=True)
+            split(lexer)
+            self.assertEqual(measures(lexer.profile), expected)
+
+        # add_rule and remove_rule add their phases to those of the build and measure the new automata
+        lexer.add_rule("b", "b")
+        self.assertEqual(lexer.profile.sizes["table_states"], len(lexer.table.accepting))
+        self.assertEqual(lexer.profile.sizes["dfa_states"], len(lexer.dfa.K))
+
+        phases = dict(lexer.profile.phases)
+        lexer.remove_rule("b")
+        self.assertTrue(all(lexer.profile.phases[phase] > phases[phase]
+                            for phase in ["parse", "subset construction", "compile"]))
+
+        # a rebuild measures the new build, and keeps the counters of the scans
+        lexer = Lexer(spec, profile=True, minimize=True)
+        profile = lexer.profile
+        lexer.lex("ab")
+        lexer.add_rule("b", "b")
+        self.assertIs(lexer.profile, profile)
+        self.assertEqual((profile.scans, profile.tokens), (1, {"ab": 1}))
+        self.assertIn("minimize", profile.phases)
+
+        self.__class__.tests_passed += 1
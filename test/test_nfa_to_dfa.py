@@ -7,7 +7,7 @@ from src.NFA import NFA
 
 class TestNFAToDFAConversion(unittest.TestCase):
     tests_passed: int = 0
-    tests_count: int = 6
+    tests_count: int = 9
 
     def __init__(self, methodName: str = "runTest") -> None:
         super().__init__(methodName)
@@ -230,3 +230,107 @@ class TestNFAToDFAConversion(unittest.TestCase):
         self.run_tests(dfa, tests)
 
         self.__class__.tests_passed += 1
+
+    def test_compile(self):
+        nfa = NFA(
+            {'a', 'b'},
+            {0, 1, 2, 3},
+            0,
+            {
+                (0, 'a'): {0, 1},
+                (0, 'b'): {0},
+                (1, 'a'): {2},
+                (1, 'b'): {2},
+                (2, 'a'): {3},
+                (2, 'b'): {3},
+            },
+            {2, 3},
+        )
+
+        dfa = nfa.subset_construction()
+        table = dfa.compile()
+        numbers = dfa.state_numbers()
+
+        self.assertEqual(table.q0, numbers[dfa.q0])
+        self.assertEqual(len(table.d), len(dfa.K) * len(dfa.S))
+
+        # every transition of the table must agree with the transition function of the dfa
+        for (state, c), next in dfa.d.items():
+            self.assertEqual(table.next(numbers[state], c), numbers[next])
+
+        self.assertEqual(table.next(table.q0, 'x'), -1)
+
+        self.__class__.tests_passed += 1
+
+    def test_minimize(self):
+        # (a|b)*abb, as a subset construction of the textbook nfa
+        nfa = NFA(
+            {'a', 'b'},
+            {0, 1, 2, 3},
+            0,
+            {
+                (0, 'a'): {0, 1},
+                (0, 'b'): {0},
+                (1, 'b'): {2},
+                (2, 'b'): {3},
+            },
+            {3},
+        )
+
+        tests = [
+            ('', False),
+            ('abb', True),
+            ('aabb', True),
+            ('babb', True),
+            ('abab', False),
+            ('abbb', False),
+            ('ababbabb', True),
+        ]
+
+        dfa = nfa.subset_construction().minimize()
+        self.structural_check(dfa)
+
+        self.assertEqual(len(dfa.K), 4)
+
+        self.run_tests(dfa, tests)
+
+        # the initial partition is given by the labels: with a single label every state is equivalent
+        dfa = nfa.subset_construction().minimize(lambda state: 0)
+
+        self.assertEqual(len(dfa.K), 1)
+
+        # an unreachable state is dropped, even with transitions into the reachable states
+        dfa = DFA({'a'}, {0, 1, 9}, 0, {(0, 'a'): 1, (9, 'a'): 1}, {1}).minimize()
+
+        self.assertEqual(len(dfa.K), 2)
+        self.assertTrue(dfa.accept('a'))
+        self.assertFalse(dfa.accept(''))
+
+        self.__class__.tests_passed += 1
+
+    def test_epsilon_closures(self):
+        # epsilon cycles: 0 -> 3 -> 0 and 7 -> 10 -> 7
+        nfa = NFA(
+            {'a'},
+            {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12},
+            0,
+            {
+                (0, ''): {1, 2, 3, 4, 9, 12},
+                (3, ''): {0, 5, 8, 11},
+                (5, ''): {6},
+                (7, ''): {10},
+                (10, ''): {7, 8, 9},
+                (5, 'a'): {0, 1, 3},
+                (7, 'a'): {8},
+                (8, 'a'): {9, 10},
+            },
+            {11, 12},
+        )
+
+        bits = nfa.to_bits()
+        closures = nfa.epsilon_closures(bits.states)
+
+        for state, closure in zip(bits.states, closures):
+            self.assertCountEqual(bits.members(closure), nfa.epsilon_closure(state))
+
+        self.__class__.tests_passed += 1
@@ -1,11 +1,14 @@
 import unittest
 from typing import Iterable
 
+from src.Lexer import Lexer
 from src.Regex import parse_regex
+from src.RegexError import RegexError
+from src.Union import Union
 
 class TestNFAToDFAConversion(unittest.TestCase):
     tests_passed: int = 0
-    tests_count: int = 10
+    tests_count: int = 16
 
     def __init__(self, methodName: str = "runTest") -> None:
         super().__init__(methodName)
@@ -19,6 +22,29 @@ class TestNFAToDFAConversion(unittest.TestCase):
         for input, ref in tests:
             self.assertEqual(dfa.accept(input), ref, f'unexpected behaviour on input "{input}" - expected {"accept" if ref else "reject"}')
 
+        # the minimal dfa must accept the same language
+        dfa = dfa.minimize()
+        for input, ref in tests:
+            self.assertEqual(dfa.accept(input), ref, f'unexpected behaviour of the minimal dfa on input "{input}" - expected {"accept" if ref else "reject"}')
+
+        # and so must the glushkov nfa, which has no epsilon transitions
+        nfa = parse_regex(regex).glushkov()
+        self.assertTrue(all(c != '' for _, c in nfa.d), 'The glushkov nfa has epsilon transitions')
+
+        dfa = nfa.subset_construction()
+        for input, ref in tests:
+            self.assertEqual(dfa.accept(input), ref, f'unexpected behaviour of the glushkov dfa on input "{input}" - expected {"accept" if ref else "reject"}')
+
+        # and so must the simplified regex
+        dfa = parse_regex(regex).simplify().thompson().subset_construction()
+        for input, ref in tests:
+            self.assertEqual(dfa.accept(input), ref, f'unexpected behaviour of the simplified regex on input "{input}" - expected {"accept" if ref else "reject"}')
+
+        # and so must the dfa of the derivatives of the regex
+        dfa = parse_regex(regex).brzozowski()
+        for input, ref in tests:
+            self.assertEqual(dfa.accept(input), ref, f'unexpected behaviour of the derivative dfa on input "{input}" - expected {"accept" if ref else "reject"}')
+
     def test_character(self):
         regex = 'x'
 
@@ -172,3 +198,135 @@ class TestNFAToDFAConversion(unittest.TestCase):
         self.run_tests(regex, tests)
 
         self.__class__.tests_passed += 1
+
+    def test_derivative(self):
+        regex = parse_regex('(a|b)*abb')
+
+        self.assertFalse(regex.nullable())
+        self.assertTrue(regex.derivative('a').derivative('b').derivative('b').nullable())
+        self.assertFalse(regex.derivative('c').nullable())
+
+        # the derivatives are normalized, so there are only as many of them as states of the minimal dfa
+        dfa = regex.brzozowski()
+        self.assertEqual(len(dfa.K), 4)
+
+        self.__class__.tests_passed += 1
+
+    def test_character_class(self):
+        regex = '[a-zA-Z_][a-zA-Z0-9_]* \\. \\d+'
+
+        tests = [
+            ('x.1', True),
+            ('_Var_12.345', True),
+            ('9x.1', False),
+            ('x1.', False),
+            ('x 1', False),
+        ]
+
+        self.run_tests(regex, tests)
+
+        self.__class__.tests_passed += 1
+
+    def test_counted_repetition(self):
+        regex = 'a{2,4}b{2,}(cd){3}'
+
+        tests = [
+            ('abbcdcdcd', False),
+            ('aabbcdcdcd', True),
+            ('aaaabbbbbcdcdcd', True),
+            ('aaaaabbcdcdcd', False),
+            ('aabcdcdcd', False),
+            ('aabbcdcd', False),
+        ]
+
+        self.run_tests(regex, tests)
+
+        self.__class__.tests_passed += 1
+
+    def test_parse_errors(self):
+        tests = [
+            ('(ab', 0),
+            ('ab)', 2),
+            ('a|*b', 2),
+            ('[a-z', 0),
+            ('[z-a]', 1),
+            ('a{3,1}', 1),
+            ('a\\', 1),
+        ]
+
+        for regex, offset in tests:
+            with self.assertRaises(RegexError) as context:
+                parse_regex(regex)
+
+            self.assertEqual(context.exception.offset, offset, f'unexpected error offset for regex "{regex}"')
+
+        self.__class__.tests_passed += 1
+
+    def test_simplify(self):
+        tests = [
+            ('(a|a)', 'a'),
+            ('(x*)*', 'x*'),
+            ('(a|b|c|d)*', '[a-d]*'),
+            ('((ab)+)?', '(ab)*'),
+            ('(a|[0-9]|c)+', '(a|c|[0-9])+'),
+            ('(a?)+', 'a*'),
+        ]
+
+        for regex, simplified in tests:
+            self.assertEqual(parse_regex(regex).simplify(), parse_regex(simplified).simplify(), f'unexpected simplification of "{regex}"')
+
+        # the union of single characters is a single leaf, so its thompson nfa has two states
+        self.assertEqual(len(parse_regex('(a|b|c|d|e|f)').simplify().thompson().K), 2)
+
+        # equal subtrees simplified with the same nodes are the same object
+        nodes = {}
+        first = parse_regex('(ab)*c').simplify(nodes)
+        second = parse_regex('(ab)*d').simplify(nodes)
+        self.assertIs(first.left, second.left)
+
+        # a long alternation is simplified in one pass, into a balanced union
+        words = [f'w{i}x' for i in range(3000)]
+        regex = parse_regex('|'.join(words)).simplify()
+        self.assertEqual(regex, parse_regex('|'.join(reversed(words))).simplify())
+
+        depth = 0
+        while isinstance(regex, Union):
+            regex = regex.left
+            depth += 1
+        self.assertLessEqual(depth, 12)
+
+        # a long literal and a large repetition count are long chains of concatenations, which are simplified,
+        # hashed and compared without recursing through them
+        literal = parse_regex('a' * 900).simplify()
+        self.assertEqual(literal, parse_regex('a{900}').simplify())
+        self.assertEqual(len(literal.brzozowski().K), 902)
+
+        spec = [('literal', 'a' * 900), ('count', '(ab){450}|b(c{600}|d{600})+'), ('a', 'a')]
+        text = 'a' * 903 + 'ab' * 450 + 'b' + 'c' * 600
+
+        for construction in ['thompson', 'glushkov', 'brzozowski']:
+            lexer = Lexer(spec, construction=construction)
+            self.assertEqual([(name, len(lexeme)) for name, lexeme in lexer.lex(text)],
+                             [('literal', 900), ('a', 1), ('a', 1), ('a', 1), ('count', 900), ('count', 601)])
+
+        self.__class__.tests_passed += 1
+
+    def test_utf8(self):
+        # [^a]\u00e9 over the bytes of the utf-8 encodings
+        dfa = parse_regex('[^a]\u00e9').utf8().thompson().subset_construction()
+
+        encode = lambda word: ''.join(chr(b) for b in word.encode())
+
+        tests = [
+            ('b\u00e9', True),
+            ('a\u00e9', False),
+            ('\u00e9\u00e9', True),
+            ('\u4e16\u00e9', True),
+            ('\U0001f600\u00e9', True),
+            ('b\u00e8', False),
+        ]
+
+        for input, ref in tests:
+            self.assertEqual(dfa.accept(encode(input)), ref, f'unexpected behaviour on input "{input}" - expected {"accept" if ref else "reject"}')
+
+        self.__class__.tests_passed += 1